@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from core.database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -79,11 +82,19 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Configured by the DB_* environment variables, see core.database
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(BASE_DIR),
+}
+
+# Pragmas of the SQLite connections, None leaves a pragma unset, see core.database
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 20000,
 }
 
 
@@ -126,6 +137,87 @@ MEDIA_URL = 'media/images/'
 MEDIA_ROOT = 'media/'
 STATIC_ROOT = 'static/'
 
+# Token authentication cache, see user.authentication
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 1024,
+    'TIMEOUT': 60,
+    'CACHE_ALIAS': None,
+}
+
+# Password hashers, the first one hashes the new passwords. The pooled one
+# hashes in the pool of user.hashing for the API, elsewhere as the Django one.
+
+PASSWORD_HASHERS = [
+    'user.hashing.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Password hashing pool, see user.hashing. Logins and signups past
+# WORKERS + MAX_PENDING concurrent hashes are answered with a 429.
+
+PASSWORD_HASHING = {
+    'WORKERS': 4,
+    'MAX_PENDING': 16,
+}
+
+# Token lifetime, see user.authentication. None keeps the tokens valid until deleted.
+
+TOKEN_EXPIRY = {
+    'EXPIRES': None,
+    'SLIDING': True,
+}
+
+# Caches. The local memory cache is per process: set CACHE_REDIS_URL to share
+# the default cache between the processes when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_REDIS_URL'],
+    } if os.environ.get('CACHE_REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Token endpoint throttling and failed login cache, see user.throttling. The
+# alias must point to a cache shared by the processes, otherwise each worker
+# applies the rates on its own: manage.py check --deploy fails on a local
+# memory cache.
+
+LOGIN_THROTTLE = {
+    'CACHE_ALIAS': 'default',
+    'RATES': {
+        'login_ip': '60/min',
+        'login_email': '10/min',
+    },
+    'FAILURE_TIMEOUT': 300,
+}
+
+# Recipe image renditions, see recipe.images
+
+RECIPE_IMAGES = {
+    'WORKERS': 2,
+    'ASYNC': True,
+}
+
+# Recipe API response cache, see recipe.cache. Disabled until CACHES defines
+# a cache shared by all the processes (memcached, redis): the default local
+# memory cache is per process, so the other workers would miss invalidations.
+
+RECIPE_API_CACHE = {
+    'CACHE_ALIAS': None,
+    'TIMEOUT': 300,
+}
+
+# Serialize the recipe list from the tag and ingredient ids stored on each
+# recipe instead of the through tables, see recipe.fast_serializers
+
+RECIPE_DENORMALIZED_RELATIONS = True
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
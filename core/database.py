@@ -0,0 +1,104 @@
+""" Tuning of the database connections
+
+The DATABASES setting is built from environment variables by
+database_settings(). SQLite connections get the pragmas of SQLITE_PRAGMAS
+when opened: with the WAL journal readers no longer block the writer, and
+the busy timeout makes a writer wait for the lock instead of failing with
+"database is locked". Transactions take the write lock when they begin
+(transaction_mode IMMEDIATE), so two of them never deadlock upgrading a
+read lock.
+"""
+import os
+
+from django.conf import settings
+
+DEFAULTS = {
+    'journal_mode': 'WAL',
+    # Durable at the checkpoints only, safe with WAL
+    'synchronous': 'NORMAL',
+    # Bytes of the database file read through a memory map
+    'mmap_size': 256 * 1024 * 1024,
+    # Milliseconds a connection waits for a lock before failing
+    'busy_timeout': 20000,
+    'foreign_keys': 'ON',
+}
+
+
+def sqlite_pragmas():
+    """ Return the SQLITE_PRAGMAS setting merged over the defaults, None values left out """
+    pragmas = {**DEFAULTS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+    return {name: value for name, value in pragmas.items() if value is not None}
+
+
+def configure_connection(connection):
+    """ Apply the pragmas to a new SQLite connection """
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else int(value)
+
+
+def env_bool(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_settings(base_dir, environ=os.environ):
+    """ Return the default database, SQLite unless DB_ENGINE is postgresql
+
+    DB_CONN_MAX_AGE keeps the connections open across requests, checked
+    before reuse. With DB_POOL_MAX_SIZE set, PostgreSQL connections are
+    taken from a psycopg pool instead, which excludes persistent connections.
+    DB_DISABLE_SERVER_SIDE_CURSORS is needed behind a pgbouncer in
+    transaction pooling mode.
+    """
+    engine = environ.get('DB_ENGINE', 'sqlite')
+    conn_max_age = env_int(environ, 'DB_CONN_MAX_AGE', 60)
+    if engine == 'sqlite':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DB_NAME') or base_dir / 'db.sqlite3',
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds, the busy timeout of the connection until the pragmas are applied
+                'timeout': 20,
+            },
+        }
+    if engine != 'postgresql':
+        raise ValueError(f'Unsupported DB_ENGINE {engine!r}, expected sqlite or postgresql.')
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME', 'app'),
+        'USER': environ.get('DB_USER', ''),
+        'PASSWORD': environ.get('DB_PASSWORD', ''),
+        'HOST': environ.get('DB_HOST', ''),
+        'PORT': environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': conn_max_age,
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': env_bool(environ, 'DB_DISABLE_SERVER_SIDE_CURSORS', False),
+        'OPTIONS': {
+            'connect_timeout': env_int(environ, 'DB_CONNECT_TIMEOUT', 10),
+        },
+    }
+    pool_size = env_int(environ, 'DB_POOL_MAX_SIZE', None)
+    if pool_size:
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', 2),
+            'max_size': pool_size,
+            # Seconds a request waits for a free connection
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', 10),
+        }
+
+    return database
@@ -8,9 +8,10 @@ from django.db import models
 
 
 def recipe_image_file_path(instance, filename):
-    """ Generates path for the images """
+    """ Generates path for the images, named after the content hash when it is known """
     ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    name = getattr(instance, 'image_hash', '') or uuid.uuid4()
+    filename = f'{name}.{ext}'
     return os.path.join('uploads/recipe/', filename)
 
 
@@ -65,6 +66,9 @@ class Tag(models.Model):
         db_table = 'Tag'
         verbose_name = 'tag'
         verbose_name_plural = 'Tags'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_tag_user_name'),
+        ]
 
     def __str__(self):
         return self.name
@@ -82,6 +86,9 @@ class Ingredient(models.Model):
         db_table = 'Ingredient'
         verbose_name = 'ingredient'
         verbose_name_plural = 'ingredients'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_ingredient_user_name'),
+        ]
 
 
 class Recipe(models.Model):
@@ -89,16 +96,30 @@ class Recipe(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    image_renditions = models.JSONField(default=dict, blank=True)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
+    # Sorted copies of the relation ids, maintained by recipe.signals
+    ingredient_ids = models.JSONField(default=list, blank=True)
+    tag_ids = models.JSONField(default=list, blank=True)
+    # Tag and ingredient names, indexed for full text search with the title
+    search_document = models.TextField(default='', blank=True, editable=False)
 
     class Meta:
         db_table = 'Recipe'
         verbose_name = 'recipe'
         verbose_name_plural = 'recipes'
+        # Sort keys of the recipe list, ending with the primary key breaking their ties
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_minutes_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,48 @@
+""" Query plan inspection, to check in tests that querysets use indexes """
+import re
+from unittest import SkipTest
+
+from django.db import connections, transaction
+
+# Plan lines reading a whole table, per database vendor
+FULL_SCAN_PATTERNS = {
+    # "SCAN Recipe" but not "SCAN Recipe USING INDEX ..." or a virtual table lookup
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW)(\S+)(?!\S| USING (COVERING )?INDEX| VIRTUAL TABLE)'),
+    'postgresql': re.compile(r'Seq Scan on "?(\w+)"?'),
+}
+
+
+class FullScanError(AssertionError):
+    pass
+
+
+def explain(queryset):
+    """ Return the plan lines of the queryset """
+    connection = connections[queryset.db]
+    with transaction.atomic(using=queryset.db):
+        if connection.vendor == 'postgresql':
+            # Small test tables are cheaper to scan, only a missing index should do it
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+
+    return plan.splitlines()
+
+
+def full_scans(queryset):
+    """ Return the tables the queryset reads in full, skip the test on other database vendors """
+    vendor = connections[queryset.db].vendor
+    pattern = FULL_SCAN_PATTERNS.get(vendor)
+    if pattern is None:
+        supported = ', '.join(FULL_SCAN_PATTERNS)
+        raise SkipTest(f'Query plans are not inspected on the {vendor} database, only on: {supported}.')
+
+    return [match.group(1) for line in explain(queryset) for match in pattern.finditer(line)]
+
+
+def assert_no_full_scan(queryset, allowed=()):
+    """ Fail if the plan of the queryset scans a table, other than the allowed ones, in full """
+    scanned = [table for table in full_scans(queryset) if table not in allowed]
+    if scanned:
+        plan = '\n'.join(explain(queryset))
+        raise FullScanError(f'Full scan of {", ".join(scanned)} in:\n{queryset.query}\n\nPlan:\n{plan}')
@@ -0,0 +1,10 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.database import configure_connection
+
+
+@receiver(connection_created)
+def configure_new_connection(sender, connection, **kwargs):
+    """ Tune each database connection when it is opened """
+    configure_connection(connection)
@@ -0,0 +1,152 @@
+import tempfile
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.database import database_settings, sqlite_pragmas
+from core.models import Tag
+
+STRESS_ALIAS = 'stress'
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+
+    def test_sqlite_by_default(self):
+        """ Test the default database is a persistent SQLite connection """
+        database = database_settings(Path('/srv/app'), environ={})
+
+        self.assertEqual(database['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(database['NAME'], Path('/srv/app/db.sqlite3'))
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertEqual(database['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+    def test_postgresql_persistent_connections(self):
+        """ Test PostgreSQL is configured from the environment """
+        database = database_settings(Path('/srv/app'), environ={
+            'DB_ENGINE': 'postgresql',
+            'DB_NAME': 'recipes',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '300',
+        })
+
+        self.assertEqual(database['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(database['NAME'], 'recipes')
+        self.assertEqual(database['HOST'], 'db')
+        self.assertEqual(database['CONN_MAX_AGE'], 300)
+        self.assertNotIn('pool', database['OPTIONS'])
+
+    def test_postgresql_pool(self):
+        """ Test a pool replaces the persistent connections """
+        database = database_settings(Path('/srv/app'), environ={
+            'DB_ENGINE': 'postgresql',
+            'DB_POOL_MAX_SIZE': '20',
+            'DB_DISABLE_SERVER_SIDE_CURSORS': 'true',
+        })
+
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20, 'timeout': 10})
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_unknown_engine(self):
+        """ Test an unsupported engine is rejected """
+        with self.assertRaises(ValueError):
+            database_settings(Path('/srv/app'), environ={'DB_ENGINE': 'oracle'})
+
+    def test_none_pragma_left_unset(self):
+        """ Test a pragma set to None is not applied """
+        with self.settings(SQLITE_PRAGMAS={'mmap_size': None}):
+            pragmas = sqlite_pragmas()
+
+        self.assertNotIn('mmap_size', pragmas)
+        self.assertEqual(pragmas['journal_mode'], 'WAL')
+
+
+class SqlitePragmaTests(TestCase):
+
+    def test_pragmas_applied(self):
+        """ Test the connections are opened with the pragmas """
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+
+        self.assertEqual(busy_timeout, sqlite_pragmas()['busy_timeout'])
+        # NORMAL
+        self.assertEqual(synchronous, 1)
+
+
+# The response cache would register its invalidation on the default database
+@override_settings(RECIPE_API_CACHE={'CACHE_ALIAS': None})
+class SqliteWritersStressTests(SimpleTestCase):
+    """ Concurrent writers on a SQLite file configured like production """
+
+    WRITERS = 8
+    TRANSACTIONS = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        databases = connections.configure_settings({
+            'default': {},
+            STRESS_ALIAS: database_settings(Path(directory.name), environ={}),
+        })
+        patcher = patch.dict(connections.settings, {STRESS_ALIAS: databases[STRESS_ALIAS]})
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        cls.addClassCleanup(cls.close_connection)
+        # Added once the test runner has set up its databases
+        cls.databases = {*cls.databases, STRESS_ALIAS}
+
+        with connections[STRESS_ALIAS].schema_editor() as editor:
+            editor.create_model(get_user_model())
+            editor.create_model(Tag)
+        cls.user = get_user_model().objects.using(STRESS_ALIAS).create(email='writer@castle.com')
+
+    @classmethod
+    def close_connection(cls):
+        connections[STRESS_ALIAS].close()
+        del connections[STRESS_ALIAS]
+
+    def write(self, writer, errors):
+        try:
+            for number in range(self.TRANSACTIONS):
+                # Reads before writing, a deferred transaction would fail to upgrade its lock
+                with transaction.atomic(using=STRESS_ALIAS):
+                    count = Tag.objects.using(STRESS_ALIAS).filter(user=self.user).count()
+                    Tag.objects.using(STRESS_ALIAS).create(user=self.user, name=f'tag {writer} {number} {count}')
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections[STRESS_ALIAS].close()
+
+    def test_wal_journal(self):
+        """ Test the database file uses the WAL journal """
+        with connections[STRESS_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_concurrent_writers(self):
+        """ Test concurrent write transactions all commit without lock errors """
+        errors = []
+        threads = [threading.Thread(target=self.write, args=(writer, errors)) for writer in range(self.WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            Tag.objects.using(STRESS_ALIAS).filter(user=self.user).count(),
+            self.WRITERS * self.TRANSACTIONS
+        )
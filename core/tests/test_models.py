@@ -86,3 +86,10 @@ class ModelTest(TestCase):
 
         exp_path = f'uploads/recipe/{uuid}.jpg'
         self.assertEqual(file_path, exp_path)
+
+    def test_recipe_file_name_content_hash(self):
+        """ Test that images with a known content hash are named after it """
+        recipe = models.Recipe(image_hash='abc123')
+        file_path = models.recipe_image_file_path(recipe, 'image.png')
+
+        self.assertEqual(file_path, 'uploads/recipe/abc123.png')
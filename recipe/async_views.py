@@ -0,0 +1,72 @@
+""" Async read views of the recipe API, see user.async_views """
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.shortcuts import aget_object_or_404
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.fast_serializers import FastIngredientSerializer, FastRecipeSerializer, FastTagSerializer
+from recipe.filters import filter_recipes
+from recipe.params import bool_param
+from recipe.renderers import RecipeJSONRenderer
+from recipe.serializers import RecipeDetailSerializer
+from user.async_views import AsyncAPIView
+
+
+class AsyncRecipeAttrListView(AsyncAPIView):
+    """ Async list of the tags or ingredients of the user """
+
+    renderer_class = RecipeJSONRenderer
+    model = None
+    serializer_class = None
+
+    async def get(self, request):
+        queryset = self.model.objects.filter(user=request.user)
+        if bool_param(request.GET, 'assigned_only'):
+            queryset = queryset.filter(recipe__isnull=False).distinct()
+
+        serializer = self.serializer_class()
+        rows = [row async for row in queryset.order_by('name').values_list(*serializer.value_fields)]
+
+        return serializer.represent_rows(rows)
+
+
+class AsyncTagListView(AsyncRecipeAttrListView):
+    model = Tag
+    serializer_class = FastTagSerializer
+
+
+class AsyncIngredientListView(AsyncRecipeAttrListView):
+    model = Ingredient
+    serializer_class = FastIngredientSerializer
+
+
+class AsyncRecipeListView(AsyncAPIView):
+    """ Async list of the recipes of the user, with the filters of RecipeViewSet """
+
+    renderer_class = RecipeJSONRenderer
+
+    async def get(self, request):
+        queryset = filter_recipes(Recipe.objects.filter(user=request.user), request.GET)
+        serializer = FastRecipeSerializer(context={'request': request})
+        rows = [row async for row in queryset.values_list(*serializer.value_fields)]
+        if settings.RECIPE_DENORMALIZED_RELATIONS:
+            return serializer.represent_rows(rows)
+
+        # The relation ids are read from the through tables
+        return await sync_to_async(serializer.represent_rows)(rows)
+
+
+class AsyncRecipeDetailView(AsyncAPIView):
+    """ Async read of a recipe of the user with its tags and ingredients """
+
+    renderer_class = RecipeJSONRenderer
+
+    async def get(self, request, pk):
+        queryset = Recipe.objects.filter(user=request.user).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.only('id', 'name').order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.only('id', 'name').order_by('id'))
+        )
+        recipe = await aget_object_or_404(queryset, pk=pk)
+
+        return RecipeDetailSerializer(recipe, context={'request': request}).data
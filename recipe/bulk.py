@@ -0,0 +1,131 @@
+from django.db import transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from recipe.cache import bump_user_version
+
+
+class BulkModelMixin:
+    """ Create, update and delete lists of objects in a single request
+
+    The whole batch is validated before anything is written. When an item is
+    invalid nothing is saved and the response holds one error dict per item,
+    in the order of the payload.
+    """
+
+    bulk_serializer_class = None
+    bulk_batch_size = 500
+    max_bulk_items = 10000
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """ Dispatch the bulk operation for the request method """
+        if request.method == 'POST':
+            response = self.bulk_create_items(request)
+        elif request.method == 'PATCH':
+            response = self.bulk_update_items(request)
+        else:
+            response = self.bulk_destroy_items(request)
+
+        # Bulk writes bypass the model signals
+        bump_user_version(request.user.pk)
+
+        return response
+
+    def get_bulk_serializer(self, *args, **kwargs):
+        kwargs.setdefault('context', self.get_serializer_context())
+        return self.bulk_serializer_class(*args, **kwargs)
+
+    def get_bulk_serializer_context(self, items):
+        """ Return the context shared by the serializers of the batch """
+        return self.get_serializer_context()
+
+    def bulk_create_items(self, request):
+        items = self._get_items(request.data)
+        context = self.get_bulk_serializer_context(items)
+        serializers = [self.get_bulk_serializer(data=item, context=context) for item in items]
+        validated = self._validate(serializers)
+
+        with transaction.atomic():
+            objs = self.perform_bulk_create(validated)
+
+        return self._bulk_response([obj.pk for obj in objs], status.HTTP_201_CREATED)
+
+    def bulk_update_items(self, request):
+        items = self._get_items(request.data)
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        instances = self.get_queryset().in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+        missing = [{} if pk in instances else {'id': ['Not found.']} for pk in ids]
+        if any(missing):
+            raise ValidationError(missing)
+
+        context = self.get_bulk_serializer_context(items)
+        serializers = [
+            self.get_bulk_serializer(instances[pk], data=item, partial=True, context=context)
+            for pk, item in zip(ids, items)
+        ]
+        validated = self._validate(serializers)
+
+        with transaction.atomic():
+            self.perform_bulk_update([instances[pk] for pk in ids], validated)
+
+        return self._bulk_response(ids, status.HTTP_200_OK)
+
+    def bulk_destroy_items(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError({'ids': ['Expected a list of ids.']})
+
+        with transaction.atomic():
+            self.get_queryset().filter(pk__in=ids).delete()
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def perform_bulk_create(self, validated):
+        """ Insert the validated items, return the created objects """
+        model = self.bulk_serializer_class.Meta.model
+        objs = [model(user=self.request.user, **data) for data in validated]
+
+        return model.objects.bulk_create(objs, batch_size=self.bulk_batch_size)
+
+    def perform_bulk_update(self, instances, validated):
+        """ Save the validated changes of each instance """
+        fields = set()
+        for instance, data in zip(instances, validated):
+            for field, value in data.items():
+                setattr(instance, field, value)
+                fields.add(field)
+
+        if fields:
+            type(instances[0]).objects.bulk_update(instances, fields, batch_size=self.bulk_batch_size)
+
+    def validate_bulk(self, validated, errors):
+        """ Hook to validate the batch as a whole, filling the per item errors """
+
+    def _get_items(self, data):
+        if not isinstance(data, list) or not data:
+            raise ValidationError({'non_field_errors': ['Expected a non empty list of items.']})
+        if len(data) > self.max_bulk_items:
+            raise ValidationError({
+                'non_field_errors': [f'Ensure there are no more than {self.max_bulk_items} items.']
+            })
+
+        return data
+
+    def _validate(self, serializers):
+        errors = [{} if serializer.is_valid() else dict(serializer.errors) for serializer in serializers]
+        validated = [serializer.validated_data if serializer.is_valid() else {} for serializer in serializers]
+        self.validate_bulk(validated, errors)
+        if any(errors):
+            raise ValidationError(errors)
+
+        return validated
+
+    def _bulk_response(self, ids, response_status):
+        queryset = self.get_queryset().filter(pk__in=ids)
+        serializer = self.get_serializer(queryset, many=True)
+
+        return Response(serializer.data, status=response_status)
@@ -0,0 +1,128 @@
+""" Response cache of the recipe API, invalidated by a version per user """
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULTS = {
+    # Django cache alias, None disables the response cache. Use a cache shared
+    # by every process (memcached, redis) when running several workers.
+    'CACHE_ALIAS': None,
+    'TIMEOUT': 300,
+}
+
+
+def cache_setting(name):
+    """ Return a RECIPE_API_CACHE setting, falling back to the default """
+    return getattr(settings, 'RECIPE_API_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    alias = cache_setting('CACHE_ALIAS')
+    return caches[alias] if alias else None
+
+
+def version_key(user_id):
+    return f'recipe-api:version:{user_id}'
+
+
+def get_user_version(cache, user_id):
+    """ Return the current data version of the user """
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # Start from the clock so an evicted counter never repeats a version
+        version = time.time_ns()
+        cache.add(version_key(user_id), version, None)
+        version = cache.get(version_key(user_id), version)
+
+    return version
+
+
+def bump_user_version(user_id):
+    """ Invalidate every cached response of the user
+
+    The version is bumped again on commit, so a response cached from data
+    read before the commit cannot outlive the transaction.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    _incr_version(cache, user_id)
+    transaction.on_commit(lambda: _incr_version(cache, user_id))
+
+
+def _incr_version(cache, user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), time.time_ns(), None)
+
+
+class CachedResponseMixin:
+    """ Cache responses per user, with ETags
+
+    The key holds the user data version, so any change to the user's recipes,
+    tags or ingredients makes the previous entries unreachable. Clients sending
+    the current ETag in If-None-Match get a 304 without the database.
+    """
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        if cache is None:
+            return handler(request, *args, **kwargs)
+
+        key = self.response_cache_key(cache, request, kwargs)
+        etag = f'"{hashlib.sha256(key.encode()).hexdigest()[:32]}"'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, cache_setting('TIMEOUT'))
+            else:
+                response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization',))
+
+        return response
+
+    def response_cache_key(self, cache, request, kwargs):
+        user_id = request.user.pk
+        params = sorted((key, tuple(values)) for key, values in request.query_params.lists())
+        parts = (
+            type(self).__name__,
+            self.action,
+            repr(sorted(kwargs.items())),
+            repr(params),
+            request.accepted_renderer.format,
+        )
+        digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+        return f'recipe-api:response:{user_id}:{get_user_version(cache, user_id)}:{digest}'
+
+
+class CachedListMixin(CachedResponseMixin):
+    """ Cache the list responses """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+
+class CachedRetrieveMixin(CachedResponseMixin):
+    """ Cache the retrieve responses, for viewsets serving a detail route """
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,33 @@
+""" Ranking of recipes by the share of their ingredients a user already has """
+from django.db.models import Count, FloatField, Q
+from django.db.models.functions import Cast
+
+from recipe.params import ids_lookup
+from recipe.relations import get_through
+
+DEFAULT_COVERAGE_LIMIT = 50
+MAX_COVERAGE_LIMIT = 500
+
+
+def rank_by_coverage(queryset, ingredient_ids, min_coverage=0.0, limit=DEFAULT_COVERAGE_LIMIT):
+    """ Return (recipe id, owned ingredients, total ingredients, coverage) rows, best first
+
+    The coverage of a recipe is the share of its ingredients found in
+    ingredient_ids. Recipes without any of them are left out. The counts are
+    computed by a single query grouping the through table by recipe.
+    """
+    through, recipe_column, related_column = get_through('ingredients')
+    owned = Count(related_column, filter=Q(**{f'{related_column}__in': ids_lookup(set(ingredient_ids), queryset.db)}))
+    rows = through.objects.filter(
+        **{f'{recipe_column}__in': queryset.values('pk')}
+    ).values(recipe_column).annotate(
+        owned=owned,
+        total=Count(related_column)
+    ).annotate(
+        coverage=Cast('owned', FloatField()) / Cast('total', FloatField())
+    ).filter(
+        owned__gt=0,
+        coverage__gte=min_coverage
+    ).order_by('-coverage', '-owned', recipe_column)
+
+    return list(rows.values_list(recipe_column, 'owned', 'total', 'coverage')[:limit])
@@ -0,0 +1,72 @@
+""" Streamed export of the recipe catalog of a user """
+import csv
+import json
+from itertools import islice
+
+from core.models import Recipe
+from recipe.relations import get_through
+from recipe.renderers import RecipeJSONRenderer
+
+EXPORT_FIELDS = ('id', 'title', 'image', 'time_minutes', 'price', 'link')
+RELATIONS = ('tags', 'ingredients')
+
+
+def iter_recipe_records(queryset, chunk_size):
+    """ Yield every recipe with its tags and ingredients, one query per relation and chunk """
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        recipe_ids = [row[0] for row in chunk]
+        related = {relation: related_names(relation, recipe_ids) for relation in RELATIONS}
+        for row in chunk:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record['image'] = record['image'] or None
+            record['price'] = str(record['price'])
+            for relation in RELATIONS:
+                record[relation] = related[relation].get(record['id'], [])
+            yield record
+
+
+def related_names(relation, recipe_ids):
+    """ Return {recipe id: [{'id', 'name'}]} for a relation of the recipes """
+    through, recipe_column, related_column = get_through(relation)
+    name_column = f'{Recipe._meta.get_field(relation).m2m_reverse_field_name()}__name'
+    rows = through.objects.filter(**{f'{recipe_column}__in': recipe_ids}).order_by(
+        related_column
+    ).values_list(recipe_column, related_column, name_column)
+
+    related = {}
+    for recipe_id, related_id, name in rows:
+        related.setdefault(recipe_id, []).append({'id': related_id, 'name': name})
+
+    return related
+
+
+def ndjson_lines(records):
+    """ Yield one JSON document per recipe """
+    renderer = RecipeJSONRenderer()
+    for record in records:
+        yield renderer.dumps(record) + b'\n'
+
+
+class _Line:
+    """ File-like object handing back what the csv writer writes """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    """ Yield a header then one CSV row per recipe, relations as JSON arrays of names """
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_FIELDS + RELATIONS).encode()
+    for record in records:
+        row = [record[field] for field in EXPORT_FIELDS]
+        # A JSON array keeps names containing any separator intact
+        row += [
+            json.dumps([item['name'] for item in record[relation]], ensure_ascii=False) for relation in RELATIONS
+        ]
+        yield writer.writerow(row).encode()
@@ -0,0 +1,120 @@
+""" Read-only serializers building their output straight from .values_list() rows
+
+They return the same data as the ModelSerializers of recipe.serializers
+without going through a Field object per value.
+"""
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from rest_framework import serializers
+
+from core.models import Recipe
+from recipe.relations import DENORMALIZED_FIELDS, related_ids
+
+PRICE_EXPONENT = Decimal(1).scaleb(-Recipe._meta.get_field('price').decimal_places)
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """ List serializer reading querysets with a single values_list() query """
+
+    def to_representation(self, data):
+        if isinstance(data, QuerySet):
+            rows = data.values_list(*self.child.value_fields)
+        else:
+            rows = [self.child.instance_row(instance) for instance in data]
+
+        return self.child.represent_rows(list(rows))
+
+
+class ValuesSerializer(serializers.BaseSerializer):
+    """ Read-only serializer of rows holding the value_fields columns """
+
+    value_fields = ()
+
+    class Meta:
+        list_serializer_class = ValuesListSerializer
+
+    def to_representation(self, instance):
+        return self.represent_rows([self.instance_row(instance)])[0]
+
+    def instance_row(self, instance):
+        return tuple(getattr(instance, field) for field in self.value_fields)
+
+    def represent_rows(self, rows):
+        return [dict(zip(self.value_fields, row)) for row in rows]
+
+    def iter_chunks(self, queryset, chunk_size):
+        """ Yield the representation of the queryset chunk by chunk, from a server side cursor """
+        rows = queryset.values_list(*self.value_fields).iterator(chunk_size=chunk_size)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield self.represent_rows(chunk)
+
+
+class FastTagSerializer(ValuesSerializer):
+    """ Fast read-only equivalent of TagSerializer """
+
+    value_fields = ('id', 'name')
+
+
+class FastIngredientSerializer(ValuesSerializer):
+    """ Fast read-only equivalent of IngredientSerializer """
+
+    value_fields = ('id', 'name')
+
+
+class FastRecipeSerializer(ValuesSerializer):
+    """ Fast read-only equivalent of RecipeSerializer """
+
+    value_fields = (
+        'id', 'title', 'image', 'image_renditions', 'time_minutes', 'price', 'link', 'ingredient_ids', 'tag_ids'
+    )
+
+    def instance_row(self, instance):
+        row = super().instance_row(instance)
+        return (row[0], row[1], instance.image.name) + row[3:]
+
+    def represent_rows(self, rows):
+        if settings.RECIPE_DENORMALIZED_RELATIONS:
+            relations = None
+        else:
+            relations = related_ids([row[0] for row in rows])
+
+        ingredient_field, tag_field = DENORMALIZED_FIELDS['ingredients'], DENORMALIZED_FIELDS['tags']
+        url = self.absolute_url
+        data = []
+        for pk, title, image, renditions, time_minutes, price, link, ingredient_ids, tag_ids in rows:
+            if relations is not None:
+                ingredient_ids, tag_ids = relations[pk][ingredient_field], relations[pk][tag_field]
+
+            data.append({
+                'id': pk,
+                'title': title,
+                'image': url(image) if image else None,
+                'image_renditions': {
+                    name: {
+                        'url': url(rendition['name']),
+                        'width': rendition['width'],
+                        'height': rendition['height'],
+                    }
+                    for name, rendition in renditions.items()
+                },
+                'ingredients': ingredient_ids,
+                'tags': tag_ids,
+                'time_minutes': time_minutes,
+                'price': '{:f}'.format(price.quantize(PRICE_EXPONENT)),
+                'link': link,
+            })
+
+        return data
+
+    def absolute_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+
+        return request.build_absolute_uri(url) if request is not None else url
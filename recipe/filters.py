@@ -0,0 +1,113 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+
+from recipe.params import id_list_param, ids_lookup
+from recipe.relations import get_through
+from recipe.search import search_recipes
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_MODES = (MATCH_ANY, MATCH_ALL)
+
+# Recipe fields filterable by range, with the parser of their values
+RANGE_FIELDS = {
+    'time_minutes': int,
+    'price': Decimal,
+}
+RANGE_LOOKUPS = ('lt', 'lte', 'gt', 'gte', 'range')
+# Sort keys backed by a (user, key) index, ties broken by primary key
+ORDERING_FIELDS = ('id', 'title', 'time_minutes', 'price')
+
+
+def filter_recipes_by_relation(queryset, relation, ids, mode=MATCH_ANY):
+    """ Filter recipes linked to any or all of the ids through a M2M relation
+
+    The through table is queried in a subquery, so the recipe rows are never
+    multiplied by a JOIN and the result needs no DISTINCT.
+    """
+    if mode not in MATCH_MODES:
+        raise ValidationError({f'{relation}_mode': f'Must be one of: {", ".join(MATCH_MODES)}.'})
+
+    through, recipe_column, related_column = get_through(relation)
+    ids = set(ids)
+
+    links = through.objects.filter(**{f'{related_column}__in': ids_lookup(ids, queryset.db)})
+    if mode == MATCH_ANY:
+        return queryset.filter(Exists(links.filter(**{recipe_column: OuterRef('pk')})))
+
+    matching = links.values(recipe_column).annotate(
+        matches=Count(related_column)
+    ).filter(matches=len(ids)).values(recipe_column)
+
+    return queryset.filter(pk__in=matching)
+
+
+def parse_range_value(field, value):
+    """ Return the value of a range filter, rejecting anything not a finite number """
+    try:
+        parsed = RANGE_FIELDS[field](value)
+    except (ValueError, InvalidOperation):
+        parsed = None
+    if parsed is None or (isinstance(parsed, Decimal) and not parsed.is_finite()):
+        raise ValueError(value)
+
+    return parsed
+
+
+def filter_recipes_by_range(queryset, params):
+    """ Apply the <field>__<lookup> range filters of the query params
+
+    __range takes the two bounds separated by a comma.
+    """
+    filters = {}
+    for field in RANGE_FIELDS:
+        for lookup in RANGE_LOOKUPS:
+            param = f'{field}__{lookup}'
+            if param not in params:
+                continue
+            values = params[param].split(',')
+            try:
+                if lookup == 'range':
+                    if len(values) != 2:
+                        raise ValueError(params[param])
+                    filters[param] = [parse_range_value(field, value) for value in values]
+                else:
+                    filters[param] = parse_range_value(field, params[param])
+            except ValueError:
+                message = 'Must be two numbers separated by a comma.' if lookup == 'range' else 'Must be a number.'
+                raise ValidationError({param: message})
+
+    return queryset.filter(**filters)
+
+
+def recipe_ordering(value):
+    """ Return the order_by() fields of an ordering param, such as "price" or "-time_minutes" """
+    field = value[1:] if value.startswith('-') else value
+    if field not in ORDERING_FIELDS:
+        choices = ', '.join(ORDERING_FIELDS)
+        raise ValidationError({'ordering': f'Must be one of: {choices}, optionally prefixed by "-".'})
+    if field == 'id':
+        return (value,)
+
+    return (value, '-id' if value.startswith('-') else 'id')
+
+
+def filter_recipes(queryset, params):
+    """ Apply the filters, search and ordering of the recipe list query params """
+    for relation in ('tags', 'ingredients'):
+        ids = id_list_param(params, relation)
+        if ids:
+            queryset = filter_recipes_by_relation(queryset, relation, ids, params.get(f'{relation}_mode', MATCH_ANY))
+
+    queryset = filter_recipes_by_range(queryset, params)
+    search = params.get('search')
+    if search is not None:
+        queryset = search_recipes(queryset, search).order_by('-search_rank', 'id')
+    else:
+        queryset = queryset.order_by('id')
+    if 'ordering' in params:
+        queryset = queryset.order_by(*recipe_ordering(params['ordering']))
+
+    return queryset
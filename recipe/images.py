@@ -0,0 +1,131 @@
+""" Generation of the resized renditions of the recipe images """
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from core.models import Recipe
+from recipe.cache import bump_user_version
+
+DEFAULTS = {
+    # name: (max width, max height, Pillow format)
+    'RENDITIONS': {
+        'thumbnail': (150, 150, 'JPEG'),
+        'medium': (600, 600, 'JPEG'),
+        'webp': (1200, 1200, 'WEBP'),
+    },
+    'QUALITY': 85,
+    'WORKERS': 2,
+    # Generate in the worker pool, False runs it in the request thread
+    'ASYNC': True,
+    'MAX_UPLOAD_SIZE': 10 * 1024 * 1024,
+    'MAX_DIMENSIONS': (10000, 10000),
+}
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+_executor = None
+
+
+def image_setting(name):
+    """ Return a RECIPE_IMAGES setting, falling back to the default """
+    return getattr(settings, 'RECIPE_IMAGES', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    """ Return the worker pool, created on first use """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=image_setting('WORKERS'),
+            thread_name_prefix='recipe-images'
+        )
+
+    return _executor
+
+
+def schedule_renditions(recipe):
+    """ Generate the renditions of the recipe image once the transaction commits """
+    recipe_id, image_name = recipe.pk, recipe.image.name
+
+    def submit():
+        if image_setting('ASYNC'):
+            get_executor().submit(_run_in_worker, recipe_id, image_name)
+        else:
+            generate_renditions(recipe_id, image_name)
+
+    transaction.on_commit(submit)
+
+
+def _run_in_worker(recipe_id, image_name):
+    close_old_connections()
+    try:
+        generate_renditions(recipe_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def generate_renditions(recipe_id, image_name):
+    """ Write the resized copies of the image and record them on the recipe """
+    with default_storage.open(image_name, 'rb') as image_file:
+        image = Image.open(image_file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+
+    base = os.path.splitext(image_name)[0]
+    renditions = {}
+    for name, (width, height, image_format) in image_setting('RENDITIONS').items():
+        rendition = image.copy()
+        rendition.thumbnail((width, height))
+        if image_format == 'JPEG' and rendition.mode != 'RGB':
+            rendition = rendition.convert('RGB')
+
+        buffer = BytesIO()
+        rendition.save(buffer, image_format, quality=image_setting('QUALITY'))
+        path = default_storage.save(
+            f'{base}_{name}.{EXTENSIONS[image_format]}',
+            ContentFile(buffer.getvalue())
+        )
+        renditions[name] = {
+            'name': path,
+            'width': rendition.width,
+            'height': rendition.height,
+            'format': image_format.lower(),
+        }
+
+    # The image may have been replaced while the renditions were generated
+    recipes = Recipe.objects.filter(pk=recipe_id, image=image_name)
+    if recipes.update(image_renditions=renditions):
+        bump_user_version(recipes.values_list('user_id', flat=True).first())
+    else:
+        delete_renditions(renditions)
+
+    return renditions
+
+
+def delete_renditions(renditions):
+    """ Remove the files of the renditions from the storage """
+    for rendition in renditions.values():
+        default_storage.delete(rendition['name'])
+
+
+def release_renditions(recipe, image_name, renditions):
+    """ Delete the renditions of a replaced image unless another recipe shares it """
+    if image_name and Recipe.objects.filter(image=image_name).exclude(pk=recipe.pk).exists():
+        return
+
+    delete_renditions(renditions)
+
+
+def shared_renditions(recipe):
+    """ Return the renditions of another recipe using the same image file """
+    other = Recipe.objects.filter(image=recipe.image.name).exclude(pk=recipe.pk).exclude(
+        image_renditions={}
+    ).values_list('image_renditions', flat=True).first()
+
+    return other or {}
@@ -0,0 +1,171 @@
+""" Streamed bulk import of recipes, in the formats written by recipe.export """
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_user_version
+from recipe.relations import DENORMALIZED_FIELDS, get_through, search_document, upsert_names
+
+RELATION_MODELS = {'tags': Tag, 'ingredients': Ingredient}
+
+# Separator of the names in the CSV cells of older exports
+CSV_LEGACY_SEPARATOR = '|'
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_ndjson(lines):
+    """ Yield (line number, record) for every non blank line """
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError as exc:
+                yield number, InvalidRecord(f'invalid JSON: {exc}')
+
+
+def csv_names(value):
+    """ Return the names of a CSV cell, a JSON array or names separated by | in older exports """
+    if not value:
+        return []
+    if value.startswith('['):
+        try:
+            return json.loads(value)
+        except ValueError:
+            pass
+
+    return [name for name in value.split(CSV_LEGACY_SEPARATOR) if name]
+
+
+def read_csv(lines):
+    """ Yield (line number, record), parsing the tag and ingredient names """
+    reader = csv.DictReader(lines)
+    for record in reader:
+        for relation in RELATION_MODELS:
+            record[relation] = csv_names(record.get(relation))
+        yield reader.line_num, record
+
+
+def relation_names(record, relation):
+    """ Return the names of a relation, given as names or {'name': ...} objects """
+    items = record.get(relation) or []
+    if not isinstance(items, list):
+        raise InvalidRecord(f'{relation} must be a list')
+
+    names = []
+    for item in items:
+        name = item.get('name') if isinstance(item, dict) else item
+        if not isinstance(name, str) or not name.strip() or len(name) > 255:
+            raise InvalidRecord(f'invalid {relation} name: {name!r}')
+        names.append(name.strip())
+
+    return names
+
+
+def parse_record(record):
+    """ Return the recipe fields and relation names of a record """
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord('expected an object')
+
+    title = record.get('title')
+    if not isinstance(title, str) or not title.strip() or len(title) > 255:
+        raise InvalidRecord('invalid title')
+
+    try:
+        time_minutes = int(record.get('time_minutes'))
+        price = Decimal(str(record.get('price'))).quantize(Decimal('0.01'))
+    except (TypeError, ValueError, OverflowError, InvalidOperation):
+        raise InvalidRecord('invalid time_minutes or price')
+    if not price.is_finite() or price.adjusted() >= 3:
+        raise InvalidRecord('invalid price')
+
+    link = record.get('link') or ''
+    if not isinstance(link, str) or len(link) > 255:
+        raise InvalidRecord('invalid link')
+
+    fields = {'title': title, 'time_minutes': time_minutes, 'price': price, 'link': link}
+
+    return fields, {relation: relation_names(record, relation) for relation in RELATION_MODELS}
+
+
+class RecipeImporter:
+    """ Import recipes for a user in batches of bulk inserts
+
+    Tag and ingredient names are resolved through in-memory name -> id maps,
+    filled with one upsert per batch for the names not seen before.
+    """
+
+    def __init__(self, user, batch_size=1000):
+        self.user = user
+        self.batch_size = batch_size
+        self.ids_by_name = {relation: {} for relation in RELATION_MODELS}
+        self.imported = 0
+        self.errors = []
+
+    def run(self, records):
+        """ Import the (line number, record) pairs, return the number of recipes """
+        records = iter(records)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            self.import_batch(batch)
+
+        bump_user_version(self.user.pk)
+
+        return self.imported
+
+    def import_batch(self, batch):
+        parsed = []
+        for number, record in batch:
+            try:
+                parsed.append(parse_record(record))
+            except InvalidRecord as exc:
+                self.errors.append((number, str(exc)))
+
+        with transaction.atomic():
+            for relation in RELATION_MODELS:
+                self.resolve_names(relation, {name for _, names in parsed for name in names[relation]})
+
+            recipes = []
+            for fields, names in parsed:
+                document = []
+                for relation, field in DENORMALIZED_FIELDS.items():
+                    # (id, name) pairs in the order sync_recipe_relations writes them
+                    pairs = sorted({(self.ids_by_name[relation][name], name) for name in names[relation]})
+                    fields[field] = [related_id for related_id, _ in pairs]
+                    document.extend(name for _, name in pairs)
+                fields['search_document'] = search_document(document)
+                recipes.append(Recipe(user=self.user, **fields))
+            Recipe.objects.bulk_create(recipes, batch_size=self.batch_size)
+
+            for relation, field in DENORMALIZED_FIELDS.items():
+                through, recipe_column, related_column = get_through(relation)
+                through.objects.bulk_create(
+                    [
+                        through(**{recipe_column: recipe.pk, related_column: related_id})
+                        for recipe in recipes
+                        for related_id in getattr(recipe, field)
+                    ],
+                    batch_size=self.batch_size
+                )
+
+        self.imported += len(recipes)
+
+    def resolve_names(self, relation, names):
+        """ Fill the name -> id map of the relation, creating the unknown names """
+        ids_by_name = self.ids_by_name[relation]
+        missing = names - ids_by_name.keys()
+        if not missing:
+            return
+
+        objs = upsert_names(RELATION_MODELS[relation], self.user, sorted(missing), self.batch_size)
+        ids_by_name.update((obj.name, obj.pk) for obj in objs)
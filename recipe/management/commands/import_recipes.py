@@ -0,0 +1,46 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import RecipeImporter, read_csv, read_ndjson
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+class Command(BaseCommand):
+    """ Import recipes with their tags and ingredients from NDJSON or CSV files """
+
+    help = 'Import recipes for a user from NDJSON or CSV files, as written by the export endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Files to import')
+        parser.add_argument('--user', required=True, help='Email of the owner of the recipes')
+        parser.add_argument('--format', choices=READERS, help='File format, guessed from the extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Recipes inserted per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["user"]} does not exist')
+
+        importer = RecipeImporter(user, batch_size=options['batch_size'])
+        start = time.perf_counter()
+        for path in options['paths']:
+            file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+            if file_format not in READERS:
+                raise CommandError(f'Unknown format for {path}, use --format')
+
+            with open(path, newline='', encoding='utf-8') as lines:
+                importer.run(READERS[file_format](lines))
+
+            for number, error in importer.errors:
+                self.stderr.write(f'{path}:{number}: {error}')
+            importer.errors.clear()
+
+        elapsed = time.perf_counter() - start
+        rate = importer.imported / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.imported} recipe(s) in {elapsed:.2f}s ({rate:.0f} recipes/s)'
+        ))
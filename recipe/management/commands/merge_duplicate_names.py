@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Ingredient, Tag
+from recipe.relations import merge_duplicate_names
+
+
+class Command(BaseCommand):
+    """ Merge the tags and ingredients of a user sharing the same name """
+
+    help = ('Merge duplicated tag and ingredient names of each user, moving their recipes to the oldest one. '
+            'Run it before adding the unique (user, name) constraints to an existing database.')
+
+    def handle(self, *args, **options):
+        for model in (Tag, Ingredient):
+            with transaction.atomic():
+                merged = merge_duplicate_names(model)
+            self.stdout.write(self.style.SUCCESS(
+                f'Merged {merged} duplicated {model._meta.verbose_name_plural.lower()}'
+            ))
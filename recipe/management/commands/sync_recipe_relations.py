@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.relations import find_inconsistent_recipes, sync_recipe_relations
+
+
+class Command(BaseCommand):
+    """ Check and repair the tag and ingredient ids stored on the recipes
+
+    migrate backfills the recipes stored before the ids, this command
+    compares every recipe with its through tables.
+    """
+
+    help = 'Check and repair the denormalized tag and ingredient ids of the recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report the inconsistent recipes')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        inconsistent = []
+        last_id = 0
+        while True:
+            batch = Recipe.objects.filter(pk__gt=last_id).order_by('pk')[:batch_size]
+            ids = list(batch.values_list('pk', flat=True))
+            if not ids:
+                break
+
+            last_id = ids[-1]
+            broken = find_inconsistent_recipes(Recipe.objects.filter(pk__in=ids))
+            if broken and not options['check']:
+                sync_recipe_relations(broken)
+            inconsistent.extend(broken)
+
+        if options['check'] and inconsistent:
+            raise CommandError(f'{len(inconsistent)} inconsistent recipe(s): {inconsistent[:20]}')
+
+        action = 'Found' if options['check'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{action} {len(inconsistent)} inconsistent recipe(s)'))
@@ -0,0 +1,127 @@
+import json
+from base64 import b64decode
+from urllib import parse
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class OptionalCursorPagination(CursorPagination):
+    """ Keyset pagination, enabled when the client sends a cursor or page size
+
+    Clients that do not ask for pages keep receiving the plain list response.
+    The ordering must end with a unique field: the cursor holds the values of
+    every ordering field of the last row, so the rows sharing a sort key are
+    told apart by the following fields instead of an offset.
+    """
+
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """ Return a page only if the client opted into pagination """
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if position is not None:
+            queryset = queryset.filter(self.after_position(position, reverse))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+
+        self.has_next = position is not None if reverse else has_following
+        self.has_previous = has_following if reverse else position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def after_position(self, position, reverse):
+        """ Return the filter of the rows following the position in the direction of the page
+
+        (a, b) > (x, y) is written a > x OR (a = x AND b > y), which the
+        database can answer from an index on the ordering fields.
+        """
+        condition, equal = Q(pk__in=[]), {}
+        for order, value in zip(self.ordering, position):
+            field = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+
+        return condition
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        position = self._get_position_from_instance(self.page[-1], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=json.dumps(position)))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        position = self._get_position_from_instance(self.page[0], self.ordering) if self.page else self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=json.dumps(position)))
+
+    def decode_cursor(self, request):
+        """ Return the cursor with its position as the list of ordering values """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            tokens = parse.parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+            position = tokens.get('p', [None])[0]
+            if position is not None:
+                position = json.loads(position)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position is not None and (
+            not isinstance(position, list) or len(position) != len(self.ordering)
+            or not all(isinstance(value, str) for value in position)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def _get_position_from_instance(self, instance, ordering):
+        """ Return the values of every ordering field of the row """
+        position = []
+        for order in ordering:
+            field = order.lstrip('-')
+            position.append(str(instance[field] if isinstance(instance, dict) else getattr(instance, field)))
+
+        return position
+
+
+class RecipeCursorPagination(OptionalCursorPagination):
+    """ Recipes paginated by primary key, or by the ordering of the view queryset """
+
+    ordering = ('id',)
+
+    def get_ordering(self, request, queryset, view):
+        """ Keep the ordering of the queryset, such as the rank of searched recipes """
+        return tuple(queryset.query.order_by) or self.ordering
+
+
+class NameCursorPagination(OptionalCursorPagination):
+    """ Tags and ingredients paginated by name, ties broken by primary key """
+
+    ordering = ('name', 'id')
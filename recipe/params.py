@@ -0,0 +1,88 @@
+""" Typed parsing of the query params of the recipe API
+
+Every parser raises a ValidationError naming the param, so bad input is
+answered with a 400 instead of failing deeper in the view.
+"""
+import json
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import ValidationError
+
+# Longest id list accepted by a filter
+MAX_IDS = 10000
+# Longer id lists are sent to the database as one array parameter
+MAX_IN_PARAMS = 500
+
+TRUE_VALUES = ('1', 'true')
+FALSE_VALUES = ('0', 'false')
+
+
+def id_list_param(params, name, max_ids=MAX_IDS):
+    """ Return the distinct ids of a comma separated param, in order, or None if absent or empty """
+    value = params.get(name)
+    if not value:
+        return None
+
+    items = value.split(',')
+    if len(items) > max_ids:
+        raise ValidationError({name: f'Must contain at most {max_ids} ids.'})
+    ids = []
+    for item in items:
+        item = item.strip()
+        if not item.isascii() or not item.isdigit() or len(item) > 18:
+            raise ValidationError({name: 'Must be a comma separated list of ids.'})
+        ids.append(int(item))
+
+    return list(dict.fromkeys(ids))
+
+
+def bool_param(params, name, default=False):
+    """ Return a 0/1 or true/false param as a boolean """
+    value = params.get(name)
+    if value is None:
+        return default
+
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValidationError({name: 'Must be one of: 0, 1, true, false.'})
+
+
+def number_param(params, name, parse, default, minimum, maximum):
+    """ Return a number param parsed by int or float, within the bounds """
+    value = params.get(name)
+    if value is None:
+        return default
+
+    try:
+        number = parse(value)
+    except ValueError:
+        number = None
+    if number is None or not minimum <= number <= maximum:
+        raise ValidationError({name: f'Must be a number between {minimum} and {maximum}.'})
+
+    return number
+
+
+def ids_lookup(ids, using='default'):
+    """ Return the right hand side of an __in lookup on the ids
+
+    Short lists are inlined as one parameter per id. Longer ones are passed
+    as a single array parameter expanded by the database, so they never
+    exceed its limit of parameters per query.
+    """
+    ids = list(ids)
+    connection = connections[using]
+    limit = min(MAX_IN_PARAMS, connection.features.max_query_params or MAX_IN_PARAMS)
+    if len(ids) <= limit:
+        return ids
+
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT value FROM json_each(%s)', (json.dumps(ids),))
+    if connection.vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::bigint[])', (ids,))
+
+    return ids
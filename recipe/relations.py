@@ -0,0 +1,191 @@
+""" Denormalized tag and ingredient ids stored on each recipe """
+from django.db import connections, models
+
+from core.models import Recipe
+
+# Recipe relation -> field holding the denormalized ids
+DENORMALIZED_FIELDS = {
+    'tags': 'tag_ids',
+    'ingredients': 'ingredient_ids',
+}
+
+
+def get_through(relation):
+    """ Return the through model of a recipe relation with its two id columns """
+    field = Recipe._meta.get_field(relation)
+
+    return (
+        field.remote_field.through,
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}_id',
+    )
+
+
+def through_indexes():
+    """ Return (through, index) leading with the related id, for lookups from a tag or ingredient
+
+    The auto-created through tables are only unique on (recipe, related), so filtering
+    recipes by tag would otherwise read back every row of the tag for its recipe id.
+    """
+    for relation in DENORMALIZED_FIELDS:
+        through, recipe_column, related_column = get_through(relation)
+        yield through, models.Index(
+            fields=[related_column, recipe_column],
+            name=f'{through._meta.db_table}_reverse_idx'.lower(),
+        )
+
+
+def ensure_through_indexes(using='default'):
+    """ Create the missing reverse indexes on the through tables """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        tables = set(connection.introspection.table_names(cursor))
+        with connection.schema_editor() as schema_editor:
+            for through, index in through_indexes():
+                table = through._meta.db_table
+                if table not in tables:
+                    continue
+                if index.name in connection.introspection.get_constraints(cursor, table):
+                    continue
+                schema_editor.add_index(through, index)
+
+
+def related_ids(recipe_ids):
+    """ Return {recipe id: {field: sorted ids}} read from the through tables """
+    relations = {pk: {field: [] for field in DENORMALIZED_FIELDS.values()} for pk in recipe_ids}
+    for relation, field in DENORMALIZED_FIELDS.items():
+        through, recipe_column, related_column = get_through(relation)
+        rows = through.objects.filter(**{f'{recipe_column}__in': recipe_ids}).order_by(
+            related_column
+        ).values_list(recipe_column, related_column)
+        for recipe_id, related_id in rows:
+            relations[recipe_id][field].append(related_id)
+
+    return relations
+
+
+def search_document(names):
+    """ Return the search document of a recipe from its tag names then ingredient names, by id """
+    return ' '.join(names)
+
+
+def related_values(recipe_ids):
+    """ Return {recipe id: {field: value}} of the denormalized fields, read from the through tables """
+    ids = {pk: {field: [] for field in DENORMALIZED_FIELDS.values()} for pk in recipe_ids}
+    names = {pk: [] for pk in recipe_ids}
+    for relation, field in DENORMALIZED_FIELDS.items():
+        through, recipe_column, related_column = get_through(relation)
+        name_field = f'{Recipe._meta.get_field(relation).m2m_reverse_field_name()}__name'
+        rows = through.objects.filter(**{f'{recipe_column}__in': list(ids)}).order_by(
+            related_column
+        ).values_list(recipe_column, related_column, name_field)
+        for recipe_id, related_id, name in rows:
+            ids[recipe_id][field].append(related_id)
+            names[recipe_id].append(name)
+
+    return {pk: {**ids[pk], 'search_document': search_document(names[pk])} for pk in ids}
+
+
+def sync_recipe_relations(recipe_ids):
+    """ Rewrite the denormalized ids and search document of the recipes from the through tables """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+
+    values = related_values(recipe_ids)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, **fields) for pk, fields in values.items()],
+        [*DENORMALIZED_FIELDS.values(), 'search_document']
+    )
+
+
+def backfill_recipe_relations(batch_size=1000):
+    """ Fill the denormalized fields of the recipes stored before them, return the number of recipes
+
+    Those recipes have links in the through tables but empty ids. Run after
+    migrate; manage.py sync_recipe_relations repairs any other difference.
+    """
+    stale = models.Q()
+    for relation, field in DENORMALIZED_FIELDS.items():
+        stale |= models.Q(**{field: [], f'{relation}__isnull': False})
+    recipe_ids = list(Recipe.objects.filter(stale).order_by('pk').values_list('pk', flat=True).distinct())
+    for start in range(0, len(recipe_ids), batch_size):
+        sync_recipe_relations(recipe_ids[start:start + batch_size])
+
+    return len(recipe_ids)
+
+
+def relation_of(model):
+    """ Return the name of the recipe relation to Tag or Ingredient """
+    return next(
+        relation for relation in DENORMALIZED_FIELDS
+        if Recipe._meta.get_field(relation).related_model is model
+    )
+
+
+def sync_linked_recipes(model, related_ids):
+    """ Rewrite the denormalized fields of the recipes linked to the tags or ingredients """
+    through, recipe_column, related_column = get_through(relation_of(model))
+    sync_recipe_relations(
+        through.objects.filter(**{f'{related_column}__in': related_ids}).values_list(recipe_column, flat=True)
+    )
+
+
+def find_inconsistent_recipes(recipes):
+    """ Return the ids of the recipes whose denormalized ids or search document are out of date """
+    fields = [*DENORMALIZED_FIELDS.values(), 'search_document']
+    stored = {pk: values for pk, *values in recipes.values_list('pk', *fields)}
+    expected = related_values(list(stored))
+
+    return [
+        pk for pk, values in stored.items()
+        if values != [expected[pk][field] for field in fields]
+    ]
+
+
+def upsert_names(model, user, names, batch_size=None):
+    """ Return the tags or ingredients of the user with the names, creating the missing ones
+
+    Relies on the unique (user, name) constraint: a single INSERT ... ON CONFLICT
+    statement returns both the existing and the new objects.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+
+    return model.objects.bulk_create(
+        [model(user=user, name=name) for name in names],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user', 'name'],
+        update_fields=['name']
+    )
+
+
+def merge_duplicate_names(model):
+    """ Merge the tags or ingredients sharing a user and a name into the oldest one
+
+    The recipe links of the duplicates are moved to the kept object. Return
+    the number of objects removed.
+    """
+    kept, keep_by_duplicate = {}, {}
+    rows = model.objects.order_by('pk').values_list('pk', 'user_id', 'name')
+    for pk, user_id, name in rows.iterator():
+        keep = kept.setdefault((user_id, name), pk)
+        if keep != pk:
+            keep_by_duplicate[pk] = keep
+    if not keep_by_duplicate:
+        return 0
+
+    through, recipe_column, related_column = get_through(relation_of(model))
+    links = through.objects.filter(**{f'{related_column}__in': list(keep_by_duplicate)})
+    moved = [
+        through(**{recipe_column: recipe_id, related_column: keep_by_duplicate[related_id]})
+        for recipe_id, related_id in links.values_list(recipe_column, related_column)
+    ]
+    through.objects.bulk_create(moved, ignore_conflicts=True)
+    links.delete()
+    model.objects.filter(pk__in=list(keep_by_duplicate)).delete()
+    sync_recipe_relations({getattr(link, recipe_column) for link in moved})
+
+    return len(keep_by_duplicate)
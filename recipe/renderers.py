@@ -0,0 +1,53 @@
+""" JSON rendering of the recipe API """
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class RecipeJSONRenderer(JSONRenderer):
+    """ JSON renderer using orjson when installed, the stdlib encoder otherwise
+
+    Types orjson does not handle the way DRF does (Decimal, datetimes, lazy
+    strings...) are passed to the DRF encoder, so both paths give the same
+    output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return self.dumps(data)
+
+    def dumps(self, data):
+        """ Encode one value to compact JSON bytes """
+        if orjson is not None:
+            ret = orjson.dumps(data, default=self.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        else:
+            ret = json.dumps(
+                data, cls=self.encoder_class, ensure_ascii=False, allow_nan=not self.strict, separators=(',', ':')
+            ).encode()
+
+        # Keep the output a strict javascript subset, as JSONRenderer does
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+    default = staticmethod(JSONEncoder().default)
+
+    def stream(self, chunks):
+        """ Yield a JSON array of the items of the chunks, one chunk at a time """
+        yield b'['
+        separator = b''
+        for chunk in chunks:
+            if chunk:
+                yield separator + b','.join(self.dumps(item) for item in chunk)
+                separator = b','
+        yield b']'
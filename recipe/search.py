@@ -0,0 +1,133 @@
+""" Full text search of recipes over their title, tag names and ingredient names
+
+SQLite indexes the recipes in a FTS5 table kept in sync by triggers on the
+Recipe table; PostgreSQL in a GIN index over their weighted text search
+vector. The tag and ingredient names are read from Recipe.search_document,
+maintained along the denormalized ids by recipe.relations.
+"""
+import functools
+import re
+import sqlite3
+from contextlib import closing
+
+from django.db import connections
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from core.models import Recipe
+
+SEARCH_TABLE = 'recipe_search'
+SEARCH_INDEX = 'recipe_search_vector_idx'
+# Terms of a query beyond this are ignored
+MAX_TERMS = 16
+# Relative weight of a match in the title over a match in the names
+TITLE_WEIGHT = 4.0
+
+FTS5_STATEMENTS = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        title, search_document, content='Recipe', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON Recipe BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, search_document) VALUES (new.id, new.title, new.search_document);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON Recipe BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, search_document)
+        VALUES ('delete', old.id, old.title, old.search_document);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, search_document ON Recipe BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, search_document)
+        VALUES ('delete', old.id, old.title, old.search_document);
+        INSERT INTO {SEARCH_TABLE}(rowid, title, search_document) VALUES (new.id, new.title, new.search_document);
+    END""",
+)
+
+
+def search_terms(text):
+    """ Return the words of a search query, without any query syntax """
+    return re.findall(r'\w+', text)[:MAX_TERMS]
+
+
+@functools.cache
+def sqlite_has_fts5():
+    """ Return whether the SQLite library has the FTS5 extension, without a database query """
+    with closing(sqlite3.connect(':memory:')) as connection:
+        return bool(connection.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+def search_backend(connection):
+    """ Return the full text engine of the database: 'fts5', 'postgresql' or None """
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        return 'fts5'
+
+    return None
+
+
+def search_vector():
+    """ Return the weighted text search vector of a recipe, on PostgreSQL """
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector('title', weight='A', config='simple')
+        + SearchVector('search_document', weight='B', config='simple')
+    )
+
+
+def ensure_search_index(using='default'):
+    """ Create the full text index of the recipes if missing, and fill it """
+    connection = connections[using]
+    backend = search_backend(connection)
+    if backend == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM sqlite_master WHERE name = '{SEARCH_TABLE}'")
+            if cursor.fetchone():
+                return
+            for statement in FTS5_STATEMENTS:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
+    elif backend == 'postgresql':
+        from django.contrib.postgres.indexes import GinIndex
+
+        with connection.cursor() as cursor:
+            if SEARCH_INDEX in connection.introspection.get_constraints(cursor, Recipe._meta.db_table):
+                return
+        with connection.schema_editor() as schema_editor:
+            schema_editor.add_index(Recipe, GinIndex(search_vector(), name=SEARCH_INDEX))
+
+
+def search_recipes(queryset, text):
+    """ Filter the recipes matching every word of the text, annotated with their search_rank
+
+    A higher search_rank is a better match. Words match as prefixes on SQLite
+    and PostgreSQL, databases without full text search fall back to substrings.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset.annotate(search_rank=Value(0.0)).none()
+
+    backend = search_backend(connections[queryset.db])
+    if backend == 'fts5':
+        query = ' '.join(f'"{term}"*' for term in terms)
+        matching = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', (query,))
+        # bm25() is lower for better matches and only available in a MATCH query
+        rank = RawSQL(
+            f'SELECT -bm25({SEARCH_TABLE}, %s, 1.0) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid = "Recipe"."id"',
+            (TITLE_WEIGHT, query),
+            output_field=FloatField()
+        )
+        return queryset.filter(pk__in=matching).annotate(search_rank=rank)
+
+    if backend == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        query = SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config='simple')
+        return queryset.alias(search_vector=search_vector()).filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(search_document__icontains=term))
+
+    return queryset.annotate(search_rank=Value(0.0))
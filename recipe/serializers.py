@@ -1,5 +1,80 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from rest_framework.relations import MANY_RELATION_KWARGS
+from core.models import Tag, Ingredient, Recipe, recipe_image_file_path
+from recipe.relations import upsert_names
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Primary key field limited to the objects of the requesting user """
+
+    default_error_messages = {
+        'does_not_exist_many': 'Invalid pk(s) {pk_values} - object does not exist.',
+    }
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+
+        return UserManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        """ Return the objects of the request user, nothing without a request """
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is None:
+            return queryset.none()
+
+        return queryset.filter(user=request.user)
+
+    def to_internal_value_many(self, data):
+        """ Resolve a list of primary keys with a single query """
+        pk_field = self.get_queryset().model._meta.pk
+        pks = []
+        for value in data:
+            if isinstance(value, bool):
+                self.fail('incorrect_type', data_type=type(value).__name__)
+            try:
+                pks.append(pk_field.to_python(value))
+            except DjangoValidationError:
+                self.fail('incorrect_type', data_type=type(value).__name__)
+
+        pks = list(dict.fromkeys(pks))
+        objects = self.get_objects(pks)
+        missing = [str(pk) for pk in pks if pk not in objects]
+        if missing:
+            self.fail('does_not_exist_many', pk_values=', '.join(missing))
+
+        return [objects[pk] for pk in pks]
+
+    def get_objects(self, pks):
+        """ Return {pk: object} of the existing pks
+
+        Bulk views load the objects of the whole batch once, in the
+        related_objects context by model, instead of a query per item.
+        """
+        queryset = self.get_queryset()
+        loaded = self.context.get('related_objects', {}).get(queryset.model)
+        if loaded is None:
+            return queryset.in_bulk(pks)
+
+        return {pk: loaded[pk] for pk in pks if pk in loaded}
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """ Many related field validating all the submitted primary keys at once """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        return self.child_relation.to_internal_value_many(data)
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -20,19 +95,100 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class ImageRenditionsField(serializers.Field):
+    """ Map of the image renditions to their urls, for srcset attributes """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        renditions = {}
+        for name, rendition in value.items():
+            url = default_storage.url(rendition['name'])
+            renditions[name] = {
+                'url': request.build_absolute_uri(url) if request is not None else url,
+                'width': rendition['width'],
+                'height': rendition['height'],
+            }
+
+        return renditions
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """ Recipe object serializer """
 
-    ingredients = serializers.PrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all())
-    tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    ingredients = UserPrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all(), required=False)
+    tags = UserPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all(), required=False)
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False
+    )
+    tag_names = serializers.ListField(child=serializers.CharField(max_length=255), write_only=True, required=False)
+    image_renditions = ImageRenditionsField()
+
+    name_fields = (
+        ('ingredients', 'ingredient_names', Ingredient),
+        ('tags', 'tag_names', Tag),
+    )
 
     class Meta:
         model = Recipe
         fields = (
-            'id', 'title', 'image', 'ingredients', 'tags', 'time_minutes', 'price', 'link'
+            'id', 'title', 'image', 'image_renditions', 'ingredients', 'tags', 'ingredient_names', 'tag_names',
+            'time_minutes', 'price', 'link'
         )
         read_only_fields = ('id',)
 
+    def validate(self, attrs):
+        """ Require the tags and ingredients on full writes, unless given by name """
+        if not self.partial:
+            errors = {
+                field: self.fields[field].error_messages['required']
+                for field, names_field, _ in self.name_fields
+                if names_field in self.fields and field not in attrs and names_field not in attrs
+            }
+            if errors:
+                raise serializers.ValidationError(errors)
+
+        return attrs
+
+    def create(self, validated_data):
+        """ Create recipe, creating the tags and ingredients given by name """
+        self.resolve_names(validated_data)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """ Update recipe, creating the tags and ingredients given by name """
+        self.resolve_names(validated_data, instance)
+        return super().update(instance, validated_data)
+
+    def resolve_names(self, validated_data, instance=None):
+        """ Add the objects named in the *_names fields to the relations
+
+        The named objects are added to the ids sent in the same request, or
+        to the current ones of the recipe when none were sent.
+        """
+        user = self.context['request'].user
+        for field, names_field, model in self.name_fields:
+            names = validated_data.pop(names_field, None)
+            if not names:
+                continue
+
+            objs = validated_data.get(field)
+            if objs is None:
+                objs = list(getattr(instance, field).all()) if instance is not None else []
+            validated_data[field] = list(dict.fromkeys([*objs, *upsert_names(model, user, names)]))
+
+
+class BulkRecipeSerializer(RecipeSerializer):
+    """ Recipe serializer for bulk writes, without the tags and ingredients given by name """
+
+    class Meta(RecipeSerializer.Meta):
+        fields = tuple(
+            field for field in RecipeSerializer.Meta.fields if field not in ('ingredient_names', 'tag_names')
+        )
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """ Recipe detail object serializer """
@@ -44,7 +200,20 @@ class RecipeDetailSerializer(RecipeSerializer):
 class RecipeImageSerializer(serializers.ModelSerializer):
     """" Image serializer """
 
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
+        fields = ('id', 'image', 'image_renditions')
         read_only_fields = ('id',)
+
+    def update(self, instance, validated_data):
+        """ Point to the stored file when an identical image was already uploaded """
+        image = validated_data.get('image')
+        instance.image_hash = getattr(image, 'content_hash', None) or ''
+        if instance.image_hash:
+            name = recipe_image_file_path(instance, image.name)
+            if default_storage.exists(name):
+                validated_data['image'] = name
+
+        return super().update(instance, validated_data)
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_user_version
+from recipe.relations import (
+    backfill_recipe_relations, ensure_through_indexes, sync_linked_recipes, sync_recipe_relations
+)
+from recipe.search import ensure_search_index
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_owner_responses(sender, instance, **kwargs):
+    """ Invalidate the cached responses of the owner of the object """
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_relation_responses(sender, instance, action, **kwargs):
+    """ Invalidate the cached responses when recipe tags or ingredients change """
+    if action.startswith('post_'):
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_new_user_responses(sender, instance, created, **kwargs):
+    """ Start a new user from a fresh version, its id may have been used before """
+    if created:
+        bump_user_version(instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def sync_denormalized_relations(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Keep the tag and ingredient ids stored on the recipes up to date """
+    if not reverse:
+        if action.startswith('post_'):
+            sync_recipe_relations([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        sync_recipe_relations(instance.__dict__.pop('_cleared_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        sync_recipe_relations(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def sync_renamed_recipes(sender, instance, created, update_fields, **kwargs):
+    """ Reindex the recipes of a renamed tag or ingredient """
+    if not created and (update_fields is None or 'name' in update_fields):
+        sync_linked_recipes(sender, [instance.pk])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_related_recipes(sender, instance, **kwargs):
+    """ Remember the recipes of a deleted tag or ingredient """
+    instance._related_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def sync_related_recipes(sender, instance, **kwargs):
+    """ Drop the id of a deleted tag or ingredient from its recipes """
+    sync_recipe_relations(instance.__dict__.pop('_related_recipe_ids', []))
+
+
+@receiver(post_migrate)
+def create_through_indexes(sender, using, **kwargs):
+    """ Add the reverse and full text indexes once the core tables exist, then backfill the recipes """
+    if sender.name == 'core':
+        ensure_through_indexes(using)
+        ensure_search_index(using)
+        if using == 'default':
+            backfill_recipe_relations()
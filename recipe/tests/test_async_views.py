@@ -0,0 +1,109 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from user.authentication import token_cache
+
+
+@override_settings(RECIPE_API_CACHE={'CACHE_ALIAS': None})
+class AsyncRecipeViewsTests(TestCase):
+    """ Test the async views return the same data as the API views """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        self.soup = Recipe.objects.create(user=self.user, title='Soup', time_minutes=30, price=4)
+        self.soup.tags.add(self.vegan)
+        self.soup.ingredients.add(self.salt)
+        Recipe.objects.create(user=self.user, title='Salad', time_minutes=5, price=7)
+
+    def tearDown(self):
+        token_cache.local.clear()
+
+    async def assert_same_data(self, url, sync_url, params=None):
+        """ Check the async view answers as the API view for the params """
+        response = await self.async_client.get(url, params or {}, headers=self.headers)
+        expected = await self.sync_get(sync_url, params or {})
+
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+
+    async def sync_get(self, url, params):
+        return await sync_to_async(self.client.get)(url, params)
+
+    async def test_recipe_list(self):
+        """ Test the recipe list and its filters """
+        url, sync_url = reverse('recipe:async-recipe-list'), reverse('recipe:recipe-list')
+        for params in (
+            {}, {'tags': str(self.vegan.id)}, {'ordering': '-price'}, {'time_minutes__lte': '10'},
+            {'search': 'soup'}, {'tags': 'x'}, {'ordering': 'link'},
+        ):
+            with self.subTest(params=params):
+                await self.assert_same_data(url, sync_url, params)
+
+    @override_settings(RECIPE_DENORMALIZED_RELATIONS=False)
+    async def test_recipe_list_from_through_tables(self):
+        """ Test the recipe list reading the relations from the through tables """
+        await self.assert_same_data(reverse('recipe:async-recipe-list'), reverse('recipe:recipe-list'))
+
+    async def test_recipe_detail(self):
+        """ Test reading a recipe and a missing one """
+        for pk in (self.soup.id, 0):
+            with self.subTest(pk=pk):
+                await self.assert_same_data(
+                    reverse('recipe:async-recipe-detail', args=[pk]),
+                    reverse('recipe:recipe-detail', args=[pk])
+                )
+
+    async def test_tag_and_ingredient_lists(self):
+        """ Test the tag and ingredient lists, with assigned_only """
+        for name in ('tag', 'ingredient'):
+            for params in ({}, {'assigned_only': '1'}):
+                with self.subTest(name=name, params=params):
+                    await self.assert_same_data(
+                        reverse(f'recipe:async-{name}-list'), reverse(f'recipe:{name}-list'), params
+                    )
+
+    async def test_other_users_recipe(self):
+        """ Test that recipes of other users are not found """
+        other = await sync_to_async(get_user_model().objects.create_user)('other@gmail.com', 'testpass')
+        recipe = await Recipe.objects.acreate(user=other, title='Stew', time_minutes=60, price=9)
+
+        response = await self.async_client.get(
+            reverse('recipe:async-recipe-detail', args=[recipe.id]), headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_authentication_required(self):
+        """ Test that requests without a valid token are rejected """
+        url = reverse('recipe:async-recipe-list')
+        for headers in ({}, {'Authorization': 'Token wrong'}, {'Authorization': 'Token'}):
+            with self.subTest(headers=headers):
+                response = await self.async_client.get(url, headers=headers)
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+                self.assertEqual(response['WWW-Authenticate'], 'Token')
+
+    async def test_method_not_allowed(self):
+        """ Test that the async views are read only """
+        response = await self.async_client.post(reverse('recipe:async-recipe-list'), headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    async def test_options(self):
+        """ Test that OPTIONS lists the allowed methods """
+        response = await self.async_client.options(reverse('recipe:async-recipe-list'), headers=self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Allow'], 'GET, HEAD, OPTIONS')
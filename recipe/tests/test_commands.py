@@ -0,0 +1,186 @@
+import json
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.importer import RecipeImporter, read_ndjson
+from recipe.relations import find_inconsistent_recipes
+from recipe.search import search_recipes
+
+
+class ImportRecipesCommandTests(TestCase):
+    """ Test the import_recipes management command """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+
+    def import_file(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as ntf:
+            ntf.write(content)
+            ntf.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_recipes', ntf.name, '--user', self.user.email, *args, stdout=stdout, stderr=stderr)
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_ndjson(self):
+        """ Test importing recipes, creating and reusing tags and ingredients """
+        existing = Tag.objects.create(user=self.user, name='Dinner')
+        records = [
+            {'title': 'Soup', 'time_minutes': 10, 'price': '5.00',
+             'tags': [{'id': 99, 'name': 'Dinner'}], 'ingredients': ['Salt', 'Water']},
+            {'title': 'Salad', 'time_minutes': 5, 'price': 3.5, 'tags': ['Dinner', 'Vegan']},
+        ]
+
+        stdout, stderr = self.import_file('\n'.join(json.dumps(r) for r in records), '.ndjson')
+
+        self.assertIn('Imported 2 recipe(s)', stdout)
+        self.assertEqual(stderr, '')
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(list(soup.tags.all()), [existing])
+        self.assertEqual(sorted(soup.ingredients.values_list('name', flat=True)), ['Salt', 'Water'])
+        self.assertEqual(soup.ingredient_ids, sorted(soup.ingredients.values_list('id', flat=True)))
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_csv(self):
+        """ Test importing the CSV export format """
+        content = (
+            'id,title,image,time_minutes,price,link,tags,ingredients\n'
+            '1,"Soup, hot",,10,5.00,,Dinner|Winter,Salt\n'
+        )
+
+        self.import_file(content, '.csv')
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Soup, hot')
+        self.assertEqual(sorted(recipe.tags.values_list('name', flat=True)), ['Dinner', 'Winter'])
+        self.assertEqual(list(recipe.ingredients.values_list('name', flat=True)), ['Salt'])
+
+    def test_import_indexes_relation_names(self):
+        """ Test that imported recipes are found by their tag and ingredient names """
+        records = [
+            {'title': 'Stir fry', 'time_minutes': 10, 'price': '5.00', 'tags': ['Vegan'], 'ingredients': ['Tofu']},
+            {'title': 'Steak', 'time_minutes': 20, 'price': '9.00', 'ingredients': ['Beef']},
+        ]
+        self.import_file('\n'.join(json.dumps(r) for r in records), '.ndjson')
+        stir_fry = Recipe.objects.get(user=self.user, title='Stir fry')
+
+        self.assertEqual(stir_fry.search_document, 'Vegan Tofu')
+        self.assertEqual(find_inconsistent_recipes(Recipe.objects.filter(user=self.user)), [])
+        for text in ('tofu', 'vegan'):
+            with self.subTest(text=text):
+                found = search_recipes(Recipe.objects.filter(user=self.user), text)
+                self.assertEqual(list(found.values_list('title', flat=True)), ['Stir fry'])
+
+    def test_import_csv_json_names(self):
+        """ Test that names in a JSON array are read exactly, separators included """
+        content = (
+            'id,title,image,time_minutes,price,link,tags,ingredients\n'
+            '1,Soup,,10,5.00,,"[""Fish | Chips"", ""Dinner""]",[]\n'
+        )
+
+        self.import_file(content, '.csv')
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(sorted(recipe.tags.values_list('name', flat=True)), ['Dinner', 'Fish | Chips'])
+        self.assertFalse(recipe.ingredients.exists())
+
+    def test_import_reports_invalid_rows(self):
+        """ Test that invalid rows are reported with their line and skipped """
+        content = '\n'.join([
+            json.dumps({'title': 'Soup', 'time_minutes': 10, 'price': '5.00'}),
+            'not json',
+            json.dumps({'title': '', 'time_minutes': 10, 'price': '5.00'}),
+            json.dumps({'title': 'Cake', 'time_minutes': 'long', 'price': '5.00'}),
+        ])
+
+        stdout, stderr = self.import_file(content, '.ndjson')
+
+        self.assertIn('Imported 1 recipe(s)', stdout)
+        self.assertIn(':2: invalid JSON', stderr)
+        self.assertIn(':3: invalid title', stderr)
+        self.assertIn(':4: invalid time_minutes or price', stderr)
+
+    def test_import_rejects_non_finite_numbers(self):
+        """ Test that NaN and infinite values are reported without losing the rest of the batch """
+        content = '\n'.join([
+            json.dumps({'title': 'Soup', 'time_minutes': 10, 'price': '5.00'}),
+            json.dumps({'title': 'Cake', 'time_minutes': 10, 'price': 'NaN'}),
+            '{"title": "Pie", "time_minutes": Infinity, "price": "5.00"}',
+        ])
+
+        stdout, stderr = self.import_file(content, '.ndjson')
+
+        self.assertIn('Imported 1 recipe(s)', stdout)
+        self.assertIn(':2: invalid price', stderr)
+        self.assertIn(':3: invalid time_minutes or price', stderr)
+        self.assertEqual(list(Recipe.objects.values_list('title', flat=True)), ['Soup'])
+
+    def test_import_unknown_user(self):
+        """ Test that the owner must exist """
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'recipes.ndjson', '--user', 'nobody@castle.com')
+
+    def test_queries_per_batch_constant(self):
+        """ Test that names are resolved per batch and not per row """
+        def records(count):
+            return read_ndjson(
+                json.dumps({'title': f'R{i}', 'time_minutes': 1, 'price': '1', 'ingredients': [f'I{i % 7}']})
+                for i in range(count)
+            )
+
+        RecipeImporter(self.user, batch_size=500).run(records(10))
+        with self.assertNumQueries(5):
+            RecipeImporter(self.user, batch_size=500).run(records(10))
+        with self.assertNumQueries(5):
+            RecipeImporter(self.user, batch_size=500).run(records(90))
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 7)
+
+
+class MergeDuplicateNamesCommandTests(TransactionTestCase):
+    """ Test the merge_duplicate_names management command """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        # Duplicates can only exist in databases created before the constraint
+        self.constraint = Tag._meta.constraints[0]
+        with patch.object(Tag._meta, 'constraints', []), connection.schema_editor() as editor:
+            editor.remove_constraint(Tag, self.constraint)
+
+    def tearDown(self):
+        Tag.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.add_constraint(Tag, self.constraint)
+
+    def test_merge_duplicate_tags(self):
+        """ Test that duplicated tags are merged and their recipes moved """
+        keep = Tag.objects.create(user=self.user, name='Vegan')
+        duplicate = Tag.objects.create(user=self.user, name='Vegan')
+        other = Tag.objects.create(user=self.user, name='Dessert')
+        recipe1 = Recipe.objects.create(user=self.user, title='Salad', time_minutes=5, price=2)
+        recipe1.tags.add(duplicate, other)
+        recipe2 = Recipe.objects.create(user=self.user, title='Sorbet', time_minutes=5, price=2)
+        recipe2.tags.add(keep, duplicate)
+
+        stdout = StringIO()
+        call_command('merge_duplicate_names', stdout=stdout)
+
+        self.assertIn('Merged 1 duplicated tags', stdout.getvalue())
+        self.assertFalse(Tag.objects.filter(id=duplicate.id).exists())
+        self.assertEqual(set(recipe1.tags.all()), {keep, other})
+        self.assertEqual(list(recipe2.tags.all()), [keep])
+        recipe1.refresh_from_db()
+        self.assertEqual(recipe1.tag_ids, sorted([keep.id, other.id]))
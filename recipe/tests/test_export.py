@@ -0,0 +1,133 @@
+import csv
+import gzip
+import json
+import tracemalloc
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.importer import RecipeImporter, read_csv
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+    """ Test the export of the recipe catalog """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count):
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f'Recipe {i}', time_minutes=i, price=Decimal('2.50'))
+            for i in range(count)
+        )
+
+    def test_export_ndjson(self):
+        """ Test that every recipe is exported with its tags and ingredients """
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=10, price=Decimal('5.00'))
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        other = get_user_model().objects.create_user('other@castle.com', 'test123')
+        Recipe.objects.create(user=other, title='Hidden', time_minutes=1, price=Decimal('1.00'))
+
+        request = self.client.get(EXPORT_URL)
+        lines = b''.join(request.streaming_content).decode().splitlines()
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line) for line in lines], [{
+            'id': recipe.id,
+            'title': 'Soup',
+            'image': None,
+            'time_minutes': 10,
+            'price': '5.00',
+            'link': '',
+            'tags': [{'id': tag.id, 'name': 'Dinner'}],
+            'ingredients': [{'id': ingredient.id, 'name': 'Salt'}],
+        }])
+
+    def test_export_csv(self):
+        """ Test the CSV export, with the relation names in one cell """
+        recipe = Recipe.objects.create(user=self.user, title='Soup, hot', time_minutes=10, price=Decimal('5.00'))
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Dinner'),
+            Tag.objects.create(user=self.user, name='Winter')
+        )
+
+        request = self.client.get(EXPORT_URL, {'type': 'csv'})
+        rows = list(csv.DictReader(StringIO(b''.join(request.streaming_content).decode())))
+
+        self.assertEqual(request['Content-Type'], 'text/csv')
+        self.assertEqual(rows[0]['title'], 'Soup, hot')
+        self.assertEqual(json.loads(rows[0]['tags']), ['Dinner', 'Winter'])
+        self.assertEqual(json.loads(rows[0]['ingredients']), [])
+
+    def test_export_csv_round_trip(self):
+        """ Test that names containing separators survive an export and import """
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=10, price=Decimal('5.00'))
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Fish | Chips'),
+            Tag.objects.create(user=self.user, name='"Quoted", [x]')
+        )
+        recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Crème fraîche'))
+
+        request = self.client.get(EXPORT_URL, {'type': 'csv'})
+        lines = StringIO(b''.join(request.streaming_content).decode())
+        other = get_user_model().objects.create_user('other@castle.com', 'test123')
+        RecipeImporter(other).run(read_csv(lines))
+
+        restored = Recipe.objects.get(user=other)
+        self.assertEqual(
+            sorted(restored.tags.values_list('name', flat=True)), ['"Quoted", [x]', 'Fish | Chips']
+        )
+        self.assertEqual(list(restored.ingredients.values_list('name', flat=True)), ['Crème fraîche'])
+
+    def test_export_invalid_type(self):
+        """ Test that unknown export formats are rejected """
+        request = self.client.get(EXPORT_URL, {'type': 'xml'})
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_gzip(self):
+        """ Test that the export is compressed when the client accepts gzip """
+        self.create_recipes(10)
+
+        request = self.client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='gzip')
+        content = gzip.decompress(b''.join(request.streaming_content))
+
+        self.assertEqual(request['Content-Encoding'], 'gzip')
+        self.assertEqual(len(content.splitlines()), 10)
+
+    def test_export_memory_bounded(self):
+        """ Test that the memory used does not grow with the number of recipes """
+        def peak_memory(count):
+            Recipe.objects.all().delete()
+            self.create_recipes(count)
+            tracemalloc.start()
+            request = self.client.get(EXPORT_URL)
+            exported = sum(1 for _ in request.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.assertEqual(exported, count)
+            return peak
+
+        with patch('recipe.views.RecipeViewSet.stream_chunk_size', 100):
+            small = peak_memory(200)
+            large = peak_memory(5000)
+
+        self.assertLess(large, small * 2)
@@ -0,0 +1,70 @@
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.fast_serializers import FastIngredientSerializer, FastRecipeSerializer, FastTagSerializer
+from recipe.serializers import IngredientSerializer, RecipeSerializer, TagSerializer
+
+
+class FastSerializerDifferentialTests(TestCase):
+    """ Test that the fast serializers return the ModelSerializers output """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.context = {'request': APIRequestFactory().get('/')}
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}') for i in range(3)]
+        ingredients = [Ingredient.objects.create(user=self.user, name=f'Ingredient {i}') for i in range(4)]
+        prices = [Decimal('5'), Decimal('12.5'), Decimal('0.99'), Decimal('999.00')]
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minutes=i * 10,
+                price=price,
+                link='https://example.com' if i % 2 else '',
+                image=f'uploads/recipe/{i}.jpg' if i % 2 else None,
+                image_renditions={
+                    'thumbnail': {'name': f'uploads/recipe/{i}_thumbnail.jpg', 'width': 150, 'height': 75}
+                } if i % 2 else {},
+            )
+            recipe.tags.add(*tags[:i])
+            recipe.ingredients.add(*reversed(ingredients[:i + 1]))
+
+    def assert_same_output(self, fast_class, model_class, queryset):
+        expected = model_class(queryset, many=True, context=self.context).data
+        self.assertEqual(fast_class(queryset, many=True, context=self.context).data, expected)
+        self.assertEqual(fast_class(list(queryset), many=True, context=self.context).data, expected)
+        self.assertEqual(
+            fast_class(queryset.first(), context=self.context).data,
+            model_class(queryset.first(), context=self.context).data
+        )
+
+    def test_recipe_output_identical(self):
+        """ Test the recipes, reading the denormalized relation ids """
+        queryset = Recipe.objects.order_by('id')
+        self.assert_same_output(FastRecipeSerializer, RecipeSerializer, queryset)
+
+    @override_settings(RECIPE_DENORMALIZED_RELATIONS=False)
+    def test_recipe_output_identical_from_through_tables(self):
+        """ Test the recipes, reading the relations from the through tables """
+        queryset = Recipe.objects.order_by('id')
+        self.assert_same_output(FastRecipeSerializer, RecipeSerializer, queryset)
+
+    def test_tag_output_identical(self):
+        """ Test the tags """
+        self.assert_same_output(FastTagSerializer, TagSerializer, Tag.objects.order_by('name'))
+
+    def test_ingredient_output_identical(self):
+        """ Test the ingredients """
+        self.assert_same_output(FastIngredientSerializer, IngredientSerializer, Ingredient.objects.order_by('name'))
+
+    def test_recipe_list_single_query(self):
+        """ Test that a recipe queryset is serialized with one query """
+        with self.assertNumQueries(1):
+            FastRecipeSerializer(Recipe.objects.order_by('id'), many=True, context=self.context).data
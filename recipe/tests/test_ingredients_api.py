@@ -79,3 +79,13 @@ class PrivateIngredientApiTests(TestCase):
         request = self.client.post(INGREDIENT_URL, payload)
 
         self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_ingredient_idempotent(self):
+        """ Test that creating an existing ingredient returns it """
+        ingredient = Ingredient.objects.create(user=self.user, name='Sugar')
+
+        request = self.client.post(INGREDIENT_URL, {'name': 'Sugar'})
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request.data['id'], ingredient.id)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,136 @@
+import random
+import string
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.params import MAX_IN_PARAMS, bool_param, id_list_param, number_param
+
+RECIPES_URL = reverse('recipe:recipe-list')
+COVERAGE_URL = reverse('recipe:recipe-coverage')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ParamParsingTests(SimpleTestCase):
+    """ Test the typed parsing of query params """
+
+    def test_id_list(self):
+        """ Test that ids are parsed in order without duplicates """
+        self.assertEqual(id_list_param({'tags': '3, 1,3,2'}, 'tags'), [3, 1, 2])
+        self.assertIsNone(id_list_param({}, 'tags'))
+        self.assertIsNone(id_list_param({'tags': ''}, 'tags'))
+
+    def test_id_list_invalid(self):
+        """ Test that malformed id lists are rejected """
+        for value in ('1,,2', '1,x', '-1', '1.0', '١', '1,' + '9' * 30, ' , '):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError) as error:
+                    id_list_param({'tags': value}, 'tags')
+                self.assertIn('tags', error.exception.detail)
+
+    def test_id_list_capped(self):
+        """ Test that too long id lists are rejected """
+        with self.assertRaises(ValidationError):
+            id_list_param({'tags': '1,2,3'}, 'tags', max_ids=2)
+
+    def test_bool(self):
+        """ Test that booleans are read from 0/1 and true/false """
+        self.assertTrue(bool_param({'stream': 'True'}, 'stream'))
+        self.assertFalse(bool_param({'stream': '0'}, 'stream', default=True))
+        self.assertTrue(bool_param({}, 'stream', default=True))
+        with self.assertRaises(ValidationError):
+            bool_param({'stream': 'yes please'}, 'stream')
+
+    def test_number(self):
+        """ Test that numbers are parsed within their bounds """
+        self.assertEqual(number_param({'limit': '5'}, 'limit', int, 10, 1, 50), 5)
+        self.assertEqual(number_param({}, 'limit', int, 10, 1, 50), 10)
+        for value in ('0', '51', '2.5', 'nan', 'inf', ''):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError):
+                    number_param({'limit': value}, 'limit', int, 10, 1, 50)
+        with self.assertRaises(ValidationError):
+            number_param({'min_coverage': 'nan'}, 'min_coverage', float, 0.0, 0, 1)
+
+
+class LongIdListTests(TestCase):
+    """ Test filtering by id lists longer than the inlined parameters """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=1)
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def long_ids(self, pk):
+        """ Return a list of ids above the inlined limit, containing pk """
+        return ','.join(str(i) for i in [pk, *range(10 ** 6, 10 ** 6 + MAX_IN_PARAMS * 3)])
+
+    def test_filter_long_id_lists(self):
+        """ Test that long id lists match in both modes """
+        for mode in ('any', 'all'):
+            with self.subTest(mode=mode):
+                request = self.client.get(RECIPES_URL, {
+                    'tags': self.long_ids(self.tag.id), 'ingredients': self.long_ids(self.ingredient.id),
+                    'tags_mode': 'any', 'ingredients_mode': mode,
+                })
+                self.assertEqual(request.status_code, status.HTTP_200_OK)
+                self.assertEqual([r['id'] for r in request.data], [self.recipe.id] if mode == 'any' else [])
+
+    def test_coverage_long_id_list(self):
+        """ Test that coverage accepts long id lists """
+        request = self.client.get(COVERAGE_URL, {'ingredients': self.long_ids(self.ingredient.id)})
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request.data[0]['coverage'], 1.0)
+
+
+@override_settings(RECIPE_API_CACHE={'CACHE_ALIAS': None})
+class ParamFuzzTests(TestCase):
+    """ Test that random query params are answered with a 200 or a 400, never a 500 """
+
+    params = {
+        RECIPES_URL: (
+            'tags', 'ingredients', 'tags_mode', 'stream', 'search', 'ordering',
+            'time_minutes__lte', 'price__range', 'page_size', 'cursor',
+        ),
+        COVERAGE_URL: ('ingredients', 'min_coverage', 'limit'),
+        TAGS_URL: ('assigned_only', 'page_size'),
+    }
+    alphabet = string.digits * 4 + ',,,-. ' + string.ascii_letters + '"*()%\x00é١'
+
+    def setUp(self):
+        self.client = APIClient(raise_request_exception=False)
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=1)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def random_value(self, rng):
+        return ''.join(rng.choice(self.alphabet) for _ in range(rng.randint(0, 12)))
+
+    def test_random_params(self):
+        """ Test a seeded sample of param combinations """
+        rng = random.Random(20)
+        for _ in range(300):
+            url = rng.choice(list(self.params))
+            params = {
+                name: self.random_value(rng)
+                for name in rng.sample(self.params[url], rng.randint(1, len(self.params[url])))
+            }
+            with self.subTest(url=url, params=params):
+                request = self.client.get(url, params)
+                # An unreadable cursor is answered with a 404 by the pagination
+                self.assertIn(
+                    request.status_code,
+                    (status.HTTP_200_OK, status.HTTP_400_BAD_REQUEST, status.HTTP_404_NOT_FOUND)
+                )
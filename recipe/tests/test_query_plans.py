@@ -0,0 +1,88 @@
+from unittest import SkipTest
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Ingredient, Recipe, Tag
+from core.query_plans import FullScanError, assert_no_full_scan, explain
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+class QueryPlanTests(TestCase):
+    """ Test that the per-user querysets of the API are served from indexes """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=1)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+    def get_queryset(self, viewset, action='list', **params):
+        """ Return the queryset the viewset builds for the action and query params """
+        request = Request(APIRequestFactory().get('/', params))
+        request.user = self.user
+        view = viewset(action=action, request=request, format_kwarg=None, kwargs={})
+
+        return view.get_queryset()
+
+    def test_tag_and_ingredient_lists(self):
+        """ Test listing names reads the (user, name) index """
+        for viewset in (TagViewSet, IngredientViewSet):
+            with self.subTest(viewset=viewset.__name__):
+                assert_no_full_scan(self.get_queryset(viewset))
+                assert_no_full_scan(self.get_queryset(viewset, assigned_only=1))
+
+    def test_recipe_actions(self):
+        """ Test the recipe querysets of every action read indexes """
+        for action in ('list', 'retrieve', 'partial_update', 'destroy', 'upload_image'):
+            with self.subTest(action=action):
+                assert_no_full_scan(self.get_queryset(RecipeViewSet, action))
+
+    def test_recipe_relation_filters(self):
+        """ Test filtering recipes by tags and ingredients reads the through indexes """
+        for mode in ('any', 'all'):
+            with self.subTest(mode=mode):
+                queryset = self.get_queryset(
+                    RecipeViewSet, tags='1,2', tags_mode=mode, ingredients='1', ingredients_mode=mode
+                )
+                assert_no_full_scan(queryset)
+
+    def test_recipe_ranges_and_orderings(self):
+        """ Test sorting and range filters read the (user, key) indexes """
+        for ordering in ('title', '-time_minutes', 'price', '-id'):
+            with self.subTest(ordering=ordering):
+                assert_no_full_scan(self.get_queryset(RecipeViewSet, ordering=ordering))
+        queryset = self.get_queryset(RecipeViewSet, price__range='1,5', ordering='price')
+        assert_no_full_scan(queryset)
+        self.assertNotIn('TEMP B-TREE', '\n'.join(explain(queryset)))
+
+    def test_recipe_search(self):
+        """ Test searching recipes reads the full text index """
+        assert_no_full_scan(self.get_queryset(RecipeViewSet, search='soup salt'))
+
+    def test_through_reverse_indexes(self):
+        """ Test the through tables are indexed from the tag and ingredient side """
+        with connection.cursor() as cursor:
+            for table in ('Recipe_tags', 'Recipe_ingredients'):
+                constraints = connection.introspection.get_constraints(cursor, table)
+                self.assertIn(f'{table.lower()}_reverse_idx', constraints)
+
+    def test_full_scan_detected(self):
+        """ Test a filter on an unindexed column is reported """
+        queryset = Recipe.objects.filter(link='https://example.com')
+
+        self.assertTrue(explain(queryset))
+        with self.assertRaises(FullScanError):
+            assert_no_full_scan(queryset)
+
+    def test_unsupported_vendor_skipped(self):
+        """ Test the plans of an unsupported database skip the test, naming the vendor """
+        with patch.object(connection, 'vendor', 'oracle'):
+            with self.assertRaisesMessage(SkipTest, 'oracle'):
+                assert_no_full_scan(Recipe.objects.all())
@@ -1,17 +1,33 @@
+import json
 import os
 import tempfile
+from base64 import b64decode, b64encode
+from io import StringIO
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
 
 from PIL import Image
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Tag, Ingredient
+from recipe.images import delete_renditions
+from recipe.pagination import RecipeCursorPagination
+from recipe.relations import backfill_recipe_relations
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse('recipe:recipe-list')
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+COVERAGE_URL = reverse('recipe:recipe-coverage')
 
 
 def image_upload_url(recipe_id):
@@ -182,8 +198,19 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        delete_renditions(self.recipe.image_renditions)
         self.recipe.image.delete()
 
+    def upload_sample_image(self, size=(10, 10)):
+        """ Upload a JPEG image of the given size to the recipe """
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            image = Image.new('RGB', size)
+            image.save(ntf, format='JPEG')
+            ntf.seek(0)
+            return self.client.post(url, {'image': ntf}, format='multipart')
+
     def test_upload_image_to_recipe(self):
         """ Test to upload the image """
 
@@ -204,6 +231,87 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn('image', request.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    @override_settings(RECIPE_IMAGES={'ASYNC': False})
+    def test_upload_image_generates_renditions(self):
+        """ Test that the renditions are generated once the upload is committed """
+        with self.captureOnCommitCallbacks(execute=True):
+            request = self.upload_sample_image(size=(2000, 1000))
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        renditions = self.recipe.image_renditions
+        self.assertEqual(set(renditions), {'thumbnail', 'medium', 'webp'})
+        self.assertEqual((renditions['thumbnail']['width'], renditions['thumbnail']['height']), (150, 75))
+        self.assertEqual(renditions['webp']['format'], 'webp')
+        for rendition in renditions.values():
+            self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, rendition['name'])))
+
+        request = self.client.get(detail_url(self.recipe.id))
+        self.assertTrue(request.data['image_renditions']['medium']['url'].startswith('http://testserver/'))
+        self.assertEqual(request.data['image_renditions']['medium']['width'], 600)
+
+    @override_settings(RECIPE_IMAGES={'ASYNC': False})
+    def test_upload_image_replaces_renditions(self):
+        """ Test that uploading a new image removes the previous renditions """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_sample_image()
+        self.recipe.refresh_from_db()
+        previous = self.recipe.image_renditions
+        previous_image = self.recipe.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.upload_sample_image(size=(20, 20))
+
+        default_storage.delete(previous_image)
+        for rendition in previous.values():
+            self.assertFalse(default_storage.exists(rendition['name']))
+
+    @override_settings(RECIPE_IMAGES={'MAX_UPLOAD_SIZE': 1024})
+    def test_upload_image_too_large(self):
+        """ Test that images over the size limit are rejected """
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'\xff\xd8\xff' + os.urandom(256 * 1024))
+            ntf.seek(0)
+            request = self.client.post(image_upload_url(self.recipe.id), {'image': ntf}, format='multipart')
+
+        self.assertEqual(request.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_upload_not_an_image(self):
+        """ Test that files without image magic bytes are rejected """
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            ntf.write(b'not an image at all')
+            ntf.seek(0)
+            request = self.client.post(image_upload_url(self.recipe.id), {'image': ntf}, format='multipart')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', request.data)
+
+    @override_settings(RECIPE_IMAGES={'MAX_DIMENSIONS': (100, 100)})
+    def test_upload_image_dimensions_limit(self):
+        """ Test that images over the dimension limit are rejected """
+        request = self.upload_sample_image(size=(200, 50))
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('100x100', request.data['image'][0])
+
+    def test_upload_identical_images_deduplicated(self):
+        """ Test that identical images are stored once, named by their hash """
+        self.upload_sample_image()
+        other = sample_recipe(user=self.user)
+        url = image_upload_url(other.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(self.recipe.image.name, f'uploads/recipe/{self.recipe.image_hash}.jpg')
+        self.assertEqual(len(self.recipe.image_hash), 64)
+
     def test_upload_image_bad_request(self):
         """ Test failed image upload """
 
@@ -217,7 +325,7 @@ class RecipeImageUploadTests(TestCase):
         recipe1 = sample_recipe(user=self.user, title='vegetable salad')
         recipe2 = sample_recipe(user=self.user, title='soup')
         tag1 = sample_tag(user=self.user, name='Vegan')
-        tag2 = sample_tag(user=self.user, name='Vegan')
+        tag2 = sample_tag(user=self.user, name='Vegetarian')
 
         recipe1.tags.add(tag1)
         recipe2.tags.add(tag2)
@@ -257,3 +365,850 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer2.data, request.data)
         self.assertNotIn(serializer3.data, request.data)
 
+
+
+@override_settings(RECIPE_API_CACHE={'CACHE_ALIAS': None})
+class RecipeQueryCountTests(TestCase):
+    """ Test that the number of queries does not grow with the recipes """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sample_recipes(self, count):
+        """ Create recipes with one tag and two ingredients each """
+        tag, _ = Tag.objects.get_or_create(user=self.user, name='Main course')
+        ingredients = [
+            Ingredient.objects.get_or_create(user=self.user, name='Salt')[0],
+            Ingredient.objects.get_or_create(user=self.user, name='Pepper')[0]
+        ]
+        for i in range(count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(*ingredients)
+
+    @override_settings(RECIPE_DENORMALIZED_RELATIONS=False)
+    def test_list_query_count_is_constant(self):
+        """ Test that listing recipes runs one query plus one per relation """
+        self.sample_recipes(1)
+        with self.assertNumQueries(3):
+            self.client.get(RECIPES_URL)
+
+        self.sample_recipes(20)
+        with self.assertNumQueries(3):
+            request = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(request.data), 21)
+        self.assertEqual(len(request.data[-1]['ingredients']), 2)
+
+    def test_list_denormalized_single_query(self):
+        """ Test that the denormalized list reads the recipe table only """
+        self.sample_recipes(20)
+        with override_settings(RECIPE_DENORMALIZED_RELATIONS=False):
+            expected = self.client.get(RECIPES_URL).data
+
+        with self.assertNumQueries(1):
+            request = self.client.get(RECIPES_URL)
+
+        self.assertEqual(request.data, expected)
+
+    def test_retrieve_query_count(self):
+        """ Test that the recipe detail prefetches nested tags and ingredients """
+        self.sample_recipes(1)
+        recipe = Recipe.objects.get(user=self.user)
+
+        with self.assertNumQueries(3):
+            request = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(request.data['tags'][0]['name'], 'Main course')
+        self.assertEqual(len(request.data['ingredients']), 2)
+
+
+class RecipePaginationTests(TestCase):
+    """ Test the opt-in cursor pagination of recipes """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_paginated_by_default(self):
+        """ Test that the list is a plain list without pagination params """
+        sample_recipe(user=self.user)
+
+        request = self.client.get(RECIPES_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(request.data, list)
+
+    def test_paginate_recipes_with_cursor(self):
+        """ Test walking through all the pages with the next cursor """
+        recipes = [sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(5)]
+
+        request = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in request.data['results']], [recipes[0].id, recipes[1].id])
+
+        seen = []
+        url = RECIPES_URL + '?page_size=2'
+        while url:
+            request = self.client.get(url)
+            seen.extend(r['id'] for r in request.data['results'])
+            url = request.data['next']
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+
+    def test_cursor_stable_under_inserts(self):
+        """ Test that new recipes do not shift the rows of the next page """
+        recipes = [sample_recipe(user=self.user, title=f'Recipe {i}') for i in range(4)]
+
+        request = self.client.get(RECIPES_URL, {'page_size': 2})
+        sample_recipe(user=self.user, title='New recipe')
+        request = self.client.get(request.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in request.data['results']],
+            [recipes[2].id, recipes[3].id]
+        )
+
+    def test_paginate_by_sort_key(self):
+        """ Test walking the pages of recipes sorted by price, with ties across pages """
+        prices = [7, 3, 5, 3, 3, 9, 5]
+        recipes = [sample_recipe(user=self.user, title=f'Recipe {i}', price=price) for i, price in enumerate(prices)]
+        expected = [recipe.id for recipe in sorted(recipes, key=lambda recipe: (-recipe.price, -recipe.id))]
+
+        seen = []
+        url = RECIPES_URL + '?ordering=-price&page_size=2'
+        while url:
+            request = self.client.get(url)
+            seen.extend(r['id'] for r in request.data['results'])
+            url = request.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_sort_key_cursor_holds_id(self):
+        """ Test that a cursor on a sort key resumes from the (price, id) of the last row, without offset """
+        recipes = [sample_recipe(user=self.user, title=f'Recipe {i}', price=3) for i in range(3)]
+
+        request = self.client.get(RECIPES_URL, {'ordering': 'price', 'page_size': 2})
+        cursor = parse_qs(urlparse(request.data['next']).query)['cursor'][0]
+        tokens = parse_qs(b64decode(cursor).decode())
+
+        self.assertNotIn('o', tokens)
+        self.assertEqual(json.loads(tokens['p'][0]), ['3.00', str(recipes[1].id)])
+
+        sample_recipe(user=self.user, title='Cheaper recipe', price=1)
+        request = self.client.get(request.data['next'])
+        self.assertEqual([r['id'] for r in request.data['results']], [recipes[2].id])
+
+        request = self.client.get(request.data['previous'])
+        self.assertEqual([r['id'] for r in request.data['results']], [recipes[0].id, recipes[1].id])
+
+    def test_invalid_cursor(self):
+        """ Test that a cursor not matching the ordering is rejected """
+        cursor = b64encode(b'p=%5B%223.00%22%5D').decode()
+
+        request = self.client.get(RECIPES_URL, {'ordering': 'price', 'cursor': cursor})
+
+        self.assertEqual(request.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_size_is_capped(self):
+        """ Test that the page size cannot exceed the maximum """
+        sample_recipe(user=self.user)
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 1):
+            sample_recipe(user=self.user)
+            request = self.client.get(RECIPES_URL, {'page_size': 1000})
+
+        self.assertEqual(len(request.data['results']), 1)
+
+
+class RecipeFilterTests(TestCase):
+    """ Test filtering recipes by tags and ingredients """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.dessert = sample_tag(user=self.user, name='Dessert')
+
+    def test_filter_any_tags_no_duplicates(self):
+        """ Test that a recipe matching several tags is returned once """
+        recipe = sample_recipe(user=self.user, title='Sorbet')
+        recipe.tags.add(self.vegan, self.dessert)
+
+        request = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{self.vegan.id},{self.dessert.id}'}
+        )
+
+        self.assertEqual([r['id'] for r in request.data], [recipe.id])
+
+    def test_filter_all_tags(self):
+        """ Test that mode all only returns recipes having every tag """
+        sorbet = sample_recipe(user=self.user, title='Sorbet')
+        sorbet.tags.add(self.vegan, self.dessert)
+        salad = sample_recipe(user=self.user, title='Salad')
+        salad.tags.add(self.vegan)
+
+        request = self.client.get(
+            RECIPES_URL,
+            {'tags': f'{self.vegan.id},{self.dessert.id}', 'tags_mode': 'all'}
+        )
+
+        self.assertEqual([r['id'] for r in request.data], [sorbet.id])
+
+    def test_filter_tags_and_ingredients(self):
+        """ Test that tag and ingredient filters are combined """
+        sugar = sample_ingredient(user=self.user)
+        sorbet = sample_recipe(user=self.user, title='Sorbet')
+        sorbet.tags.add(self.dessert)
+        sorbet.ingredients.add(sugar)
+        cake = sample_recipe(user=self.user, title='Cake')
+        cake.tags.add(self.dessert)
+
+        request = self.client.get(
+            RECIPES_URL,
+            {'tags': str(self.dessert.id), 'ingredients': str(sugar.id), 'ingredients_mode': 'all'}
+        )
+
+        self.assertEqual([r['id'] for r in request.data], [sorbet.id])
+
+    def test_filter_invalid_mode(self):
+        """ Test that an unknown match mode is rejected """
+        request = self.client.get(
+            RECIPES_URL,
+            {'tags': str(self.vegan.id), 'tags_mode': 'some'}
+        )
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_time_and_price_ranges(self):
+        """ Test filtering recipes by time and price bounds """
+        quick = sample_recipe(user=self.user, title='Salad', time_minutes=5, price=8)
+        cheap = sample_recipe(user=self.user, title='Soup', time_minutes=30, price=3)
+        sample_recipe(user=self.user, title='Roast', time_minutes=90, price=20)
+
+        request = self.client.get(RECIPES_URL, {'time_minutes__lte': 30})
+        self.assertEqual([r['id'] for r in request.data], [quick.id, cheap.id])
+
+        request = self.client.get(RECIPES_URL, {'price__range': '2.50,10', 'time_minutes__gte': 10})
+        self.assertEqual([r['id'] for r in request.data], [cheap.id])
+
+    def test_filter_invalid_ranges(self):
+        """ Test that bounds which are not numbers are rejected """
+        params = (
+            {'time_minutes__lte': 'soon'}, {'time_minutes__gt': '1.5'}, {'price__gte': 'NaN'},
+            {'price__range': '1'}, {'price__range': '1,2,3'}, {'price__lt': 'Infinity'},
+        )
+        for param in params:
+            with self.subTest(param=param):
+                request = self.client.get(RECIPES_URL, param)
+                self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(next(iter(param)), request.data)
+
+    def test_ordering(self):
+        """ Test sorting recipes by a whitelisted key, ties broken by id """
+        roast = sample_recipe(user=self.user, title='Roast', time_minutes=90, price=20)
+        soup = sample_recipe(user=self.user, title='Soup', time_minutes=30, price=3)
+        salad = sample_recipe(user=self.user, title='Salad', time_minutes=30, price=8)
+
+        request = self.client.get(RECIPES_URL, {'ordering': 'time_minutes'})
+        self.assertEqual([r['id'] for r in request.data], [soup.id, salad.id, roast.id])
+
+        request = self.client.get(RECIPES_URL, {'ordering': '-price'})
+        self.assertEqual([r['id'] for r in request.data], [roast.id, salad.id, soup.id])
+
+    def test_invalid_ordering(self):
+        """ Test that sorting by a key without an index is rejected """
+        for ordering in ('link', '--price', 'user__email', ''):
+            with self.subTest(ordering=ordering):
+                request = self.client.get(RECIPES_URL, {'ordering': ordering})
+                self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTests(TestCase):
+    """ Test the full text search of recipes """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, text, **params):
+        """ Return the ids of the recipes found for the text """
+        request = self.client.get(RECIPES_URL, {'search': text, **params})
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+        return [r['id'] for r in request.data]
+
+    def test_search_title_tags_and_ingredients(self):
+        """ Test that words match the title, tag names and ingredient names """
+        soup = sample_recipe(user=self.user, title='Tomato soup')
+        salad = sample_recipe(user=self.user, title='Summer salad')
+        salad.tags.add(sample_tag(user=self.user, name='Vegan'))
+        salad.ingredients.add(sample_ingredient(user=self.user, name='Tomatoes'))
+        sample_recipe(user=self.user, title='Crepes')
+
+        self.assertEqual(self.search('tomato'), [soup.id, salad.id])
+        self.assertEqual(self.search('vegan'), [salad.id])
+        self.assertEqual(self.search('TOMATO summer'), [salad.id])
+        self.assertEqual(self.search('pizza'), [])
+
+    def test_search_other_users(self):
+        """ Test that recipes of other users are not found """
+        other = get_user_model().objects.create_user('other@castle.com', 'test123')
+        sample_recipe(user=other, title='Tomato soup')
+
+        self.assertEqual(self.search('tomato'), [])
+
+    def test_search_follows_changes(self):
+        """ Test that renamed recipes, tags and removed recipes are reindexed """
+        recipe = sample_recipe(user=self.user, title='Soup')
+        tag = sample_tag(user=self.user, name='Winter')
+        recipe.tags.add(tag)
+
+        recipe.title = 'Chowder'
+        recipe.save()
+        tag.name = 'Autumn'
+        tag.save()
+        self.assertEqual(self.search('soup'), [])
+        self.assertEqual(self.search('chowder autumn'), [recipe.id])
+
+        recipe.tags.remove(tag)
+        self.assertEqual(self.search('autumn'), [])
+        recipe.delete()
+        self.assertEqual(self.search('chowder'), [])
+
+    def test_search_bulk_renamed_tags(self):
+        """ Test that tags renamed in bulk are reindexed """
+        recipe = sample_recipe(user=self.user, title='Soup')
+        tag = sample_tag(user=self.user, name='Winter')
+        recipe.tags.add(tag)
+
+        self.client.patch(reverse('recipe:tag-bulk'), [{'id': tag.id, 'name': 'Autumn'}], format='json')
+
+        self.assertEqual(self.search('autumn'), [recipe.id])
+
+    def test_search_query_syntax(self):
+        """ Test that search operators and quotes are read as plain words """
+        recipe = sample_recipe(user=self.user, title='Fish and chips')
+
+        self.assertEqual(self.search('"fish" OR (NEAR'), [])
+        self.assertEqual(self.search('fish AND chips*'), [recipe.id])
+        self.assertEqual(self.search('"(*'), [])
+
+    def test_search_paginated_by_rank(self):
+        """ Test that search results are paginated in rank order """
+        titles = ['Cake', 'Lemon cake', 'Lemon pie', 'Lemon lemon tart']
+        recipes = {title: sample_recipe(user=self.user, title=title) for title in titles}
+        expected = self.search('lemon')
+
+        ids = []
+        url = RECIPES_URL + '?search=lemon&page_size=1'
+        while url:
+            request = self.client.get(url)
+            ids.extend(r['id'] for r in request.data['results'])
+            url = request.data['next']
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(expected[0], recipes['Lemon lemon tart'].id)
+        self.assertNotIn(recipes['Cake'].id, ids)
+
+
+class RecipeCoverageTests(TestCase):
+    """ Test ranking recipes by the ingredients the user has """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+        self.eggs = sample_ingredient(user=self.user, name='Eggs')
+        self.flour = sample_ingredient(user=self.user, name='Flour')
+        self.milk = sample_ingredient(user=self.user, name='Milk')
+        self.sugar = sample_ingredient(user=self.user, name='Sugar')
+
+    def create_recipe(self, title, *ingredients):
+        recipe = sample_recipe(user=self.user, title=title)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def coverage(self, *ingredients, **params):
+        return self.client.get(
+            COVERAGE_URL,
+            {'ingredients': ','.join(str(ingredient.id) for ingredient in ingredients), **params}
+        )
+
+    def test_recipes_ranked_by_coverage(self):
+        """ Test that recipes are ranked by the share of ingredients owned """
+        crepes = self.create_recipe('Crepes', self.eggs, self.flour, self.milk)
+        omelette = self.create_recipe('Omelette', self.eggs)
+        cake = self.create_recipe('Cake', self.eggs, self.flour, self.milk, self.sugar)
+        self.create_recipe('Syrup', self.sugar)
+
+        request = self.coverage(self.eggs, self.flour)
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in request.data], [omelette.id, crepes.id, cake.id])
+        self.assertEqual([r['coverage'] for r in request.data], [1.0, 2 / 3, 0.5])
+        self.assertEqual(request.data[2]['missing_ingredients'], [self.milk.id, self.sugar.id])
+        self.assertEqual(request.data[2]['title'], 'Cake')
+
+    def test_min_coverage_and_limit(self):
+        """ Test filtering by minimum coverage and keeping the top results """
+        crepes = self.create_recipe('Crepes', self.eggs, self.flour, self.milk)
+        omelette = self.create_recipe('Omelette', self.eggs)
+        self.create_recipe('Cake', self.eggs, self.flour, self.milk, self.sugar)
+
+        request = self.coverage(self.eggs, self.flour, min_coverage='0.6')
+        self.assertEqual([r['id'] for r in request.data], [omelette.id, crepes.id])
+
+        request = self.coverage(self.eggs, self.flour, limit=1)
+        self.assertEqual([r['id'] for r in request.data], [omelette.id])
+
+    def test_coverage_other_users(self):
+        """ Test that recipes of other users are not ranked """
+        other = get_user_model().objects.create_user('other@castle.com', 'test123')
+        recipe = sample_recipe(user=other)
+        recipe.ingredients.add(self.eggs)
+
+        request = self.coverage(self.eggs)
+
+        self.assertEqual(request.data, [])
+
+    def test_coverage_invalid_params(self):
+        """ Test that missing ingredients and out of range params are rejected """
+        self.assertEqual(self.client.get(COVERAGE_URL).status_code, status.HTTP_400_BAD_REQUEST)
+        for params in ({'min_coverage': '2'}, {'min_coverage': 'all'}, {'limit': '0'}, {'limit': '100000'}):
+            with self.subTest(params=params):
+                request = self.coverage(self.eggs, **params)
+                self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_coverage_query_count(self):
+        """ Test that the ranking and the recipes are read with two queries """
+        for i in range(5):
+            self.create_recipe(f'Recipe {i}', self.eggs, self.flour)
+
+        with CaptureQueriesContext(connection) as queries:
+            request = self.coverage(self.eggs)
+
+        self.assertEqual(len(request.data), 5)
+        self.assertEqual(len(queries), 2)
+
+
+class RecipeBulkApiTests(TestCase):
+    """ Test the bulk recipe endpoints """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = sample_tag(user=self.user)
+        self.ingredient = sample_ingredient(user=self.user)
+
+    def test_bulk_create_recipes(self):
+        """ Test creating several recipes with their relations in one request """
+        payload = [
+            {
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [self.tag.id],
+                'ingredients': [self.ingredient.id]
+            }
+            for i in range(3)
+        ]
+
+        request = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(request.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()), [self.ingredient])
+
+    def test_bulk_create_query_count_is_constant(self):
+        """ Test that the number of queries does not depend on the batch size """
+        def payload(count):
+            return [
+                {'title': 'Recipe', 'time_minutes': 10, 'price': '5.00', 'tags': [self.tag.id]}
+                for _ in range(count)
+            ]
+
+        with self.assertNumQueries(11):
+            self.client.post(RECIPES_BULK_URL, payload(2), format='json')
+        with self.assertNumQueries(11):
+            self.client.post(RECIPES_BULK_URL, payload(50), format='json')
+
+    def test_bulk_create_reports_item_errors(self):
+        """ Test that an invalid item rejects the whole batch with per item errors """
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        foreign_tag = sample_tag(user=user2)
+        payload = [
+            {'title': 'Valid', 'time_minutes': 10, 'price': '5.00'},
+            {'title': 'Foreign tag', 'time_minutes': 10, 'price': '5.00', 'tags': [foreign_tag.id]},
+            {'time_minutes': 10, 'price': '5.00'},
+        ]
+
+        request = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(request.data[0], {})
+        self.assertIn('tags', request.data[1])
+        self.assertIn('title', request.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_errors_match_single_write(self):
+        """ Test that bulk items are validated by the same related fields as a single recipe """
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        foreign_tag = sample_tag(user=user2)
+        item = {
+            'title': 'Foreign tag', 'time_minutes': 10, 'price': '5.00',
+            'tags': [foreign_tag.id], 'ingredients': [self.ingredient.id]
+        }
+
+        single = self.client.post(RECIPES_URL, item, format='json')
+        bulk = self.client.post(RECIPES_BULK_URL, [item], format='json')
+
+        self.assertEqual(bulk.data[0]['tags'], single.data['tags'])
+        self.assertEqual(bulk.data[0]['tags'], [f'Invalid pk(s) {foreign_tag.id} - object does not exist.'])
+
+    def test_bulk_update_recipes(self):
+        """ Test updating fields and relations of several recipes """
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=self.user)
+        recipe2.tags.add(self.tag)
+        payload = [
+            {'id': recipe1.id, 'title': 'Updated', 'tags': [self.tag.id]},
+            {'id': recipe2.id, 'tags': []},
+        ]
+
+        request = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        self.assertEqual(recipe1.title, 'Updated')
+        self.assertEqual(list(recipe1.tags.all()), [self.tag])
+        self.assertFalse(recipe2.tags.exists())
+
+    def test_bulk_update_unknown_recipe(self):
+        """ Test that recipes of other users cannot be updated """
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        recipe = sample_recipe(user=user2)
+
+        request = self.client.patch(RECIPES_BULK_URL, [{'id': recipe.id, 'title': 'x'}], format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(request.data[0], {'id': ['Not found.']})
+
+    def test_bulk_delete_recipes(self):
+        """ Test deleting several recipes, leaving other users' recipes """
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        recipe1 = sample_recipe(user=self.user)
+        recipe2 = sample_recipe(user=user2)
+
+        request = self.client.delete(RECIPES_BULK_URL, {'ids': [recipe1.id, recipe2.id]}, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(id=recipe1.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=recipe2.id).exists())
+
+
+class RecipeRelationValidationTests(TestCase):
+    """ Test the validation of the tags and ingredients of a recipe """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_relations_resolved_in_one_query(self):
+        """ Test that the number of queries does not depend on the ingredients """
+        def payload(count):
+            ingredients = [sample_ingredient(user=self.user, name=f'Ingredient {count}-{i}') for i in range(count)]
+            return {
+                'title': 'Soup',
+                'time_minutes': 10,
+                'price': '5.00',
+                'ingredients': [ingredient.id for ingredient in ingredients],
+                'tags': [],
+            }
+
+        small, large = payload(1), payload(50)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(RECIPES_URL, small, format='json')
+        with CaptureQueriesContext(connection) as large_queries:
+            request = self.client.post(RECIPES_URL, large, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(large_queries), len(small_queries))
+        self.assertEqual(len(request.data['ingredients']), 50)
+
+    def test_foreign_relations_rejected(self):
+        """ Test that tags of another user are reported in a single error """
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        own = sample_tag(user=self.user)
+        foreign = [sample_tag(user=user2, name='Foreign 1'), sample_tag(user=user2, name='Foreign 2')]
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tags': [own.id] + [tag.id for tag in foreign],
+            'ingredients': [],
+        }
+
+        request = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(request.data['tags']), 1)
+        self.assertIn(f'{foreign[0].id}, {foreign[1].id}', request.data['tags'][0])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_with_names(self):
+        """ Test that tags and ingredients can be given by name """
+        tag = sample_tag(user=self.user, name='Dinner')
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '5.00',
+            'tag_names': ['Dinner', 'Winter'],
+            'ingredient_names': ['Salt'],
+        }
+
+        request = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('tag_names', request.data)
+        recipe = Recipe.objects.get(id=request.data['id'])
+        self.assertIn(tag, recipe.tags.all())
+        self.assertEqual(sorted(recipe.tags.values_list('name', flat=True)), ['Dinner', 'Winter'])
+        self.assertEqual(list(recipe.ingredients.values_list('name', flat=True)), ['Salt'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_patch_names_keep_relations(self):
+        """ Test that names sent alone are added to the current tags of the recipe """
+        recipe = sample_recipe(user=self.user)
+        tag = sample_tag(user=self.user, name='Dinner')
+        recipe.tags.add(tag)
+
+        request = self.client.patch(detail_url(recipe.id), {'tag_names': ['Winter']}, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(recipe.tags.values_list('name', flat=True)), ['Dinner', 'Winter'])
+
+    def test_create_requires_relations(self):
+        """ Test that the tags and ingredients are required unless given by name """
+        payload = {'title': 'Soup', 'time_minutes': 10, 'price': '5.00', 'tag_names': ['Dinner']}
+
+        request = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(request.data), ['ingredients'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_pk_type(self):
+        """ Test that a non numeric id is a validation error """
+        payload = {'title': 'Soup', 'time_minutes': 10, 'price': '5.00', 'tags': ['x'], 'ingredients': []}
+
+        request = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', request.data)
+
+
+@override_settings(RECIPE_API_CACHE={'CACHE_ALIAS': 'default', 'TIMEOUT': 300})
+class RecipeResponseCacheTests(TestCase):
+    """ Test the cached responses of the recipe API """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_tag_and_ingredient_have_no_detail(self):
+        """ Test that the cache does not add detail routes to the tags and ingredients """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+
+        for url in (f'/api/recipe/tags/{tag.id}/', f'/api/recipe/ingredients/{ingredient.id}/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_served_from_cache(self):
+        """ Test that an unchanged list does not hit the database """
+        sample_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_cache_invalidated_on_change(self):
+        """ Test that saving a recipe or its relations refreshes the list """
+        recipe = sample_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        recipe.tags.add(sample_tag(user=self.user))
+        second = self.client.get(RECIPES_URL)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(second.data[0]['tags']), 1)
+
+        recipe.title = 'Changed'
+        recipe.save()
+        request = self.client.get(detail_url(recipe.id))
+        self.assertEqual(request.data['title'], 'Changed')
+
+    def test_if_none_match_not_modified(self):
+        """ Test that the current ETag gets a 304 without the database """
+        sample_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            request = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(request.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(request['ETag'], first['ETag'])
+
+    def test_cache_per_user_and_params(self):
+        """ Test that users and query parameters get their own entries """
+        sample_recipe(user=self.user)
+        user2 = get_user_model().objects.create_user('other@castle.com', 'test123')
+        self.client.get(RECIPES_URL)
+
+        self.client.force_authenticate(user2)
+        request = self.client.get(RECIPES_URL)
+        self.assertEqual(request.data, [])
+
+        self.client.force_authenticate(self.user)
+        request = self.client.get(RECIPES_URL, {'page_size': 1})
+        self.assertEqual(len(request.data['results']), 1)
+
+    def test_bulk_write_invalidates_cache(self):
+        """ Test that bulk writes, which skip the model signals, refresh the list """
+        self.client.get(RECIPES_URL)
+        payload = [{'title': 'Bulk', 'time_minutes': 10, 'price': '5.00'}]
+        self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        request = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(request.data), 1)
+
+
+class DenormalizedRelationsTests(TestCase):
+    """ Test the tag and ingredient ids stored on the recipes """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.recipe = sample_recipe(user=self.user)
+        self.tag1 = sample_tag(user=self.user, name='Vegan')
+        self.tag2 = sample_tag(user=self.user, name='Dessert')
+
+    def test_ids_follow_relation_changes(self):
+        """ Test that adding, removing and clearing keep the ids in sync """
+        self.recipe.tags.add(self.tag2, self.tag1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, sorted([self.tag1.id, self.tag2.id]))
+
+        self.recipe.tags.remove(self.tag1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [self.tag2.id])
+
+        self.recipe.tags.clear()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [])
+
+    def test_ids_follow_reverse_changes(self):
+        """ Test that changes from the tag side update the recipes """
+        ingredient = sample_ingredient(user=self.user)
+        ingredient.recipe_set.add(self.recipe)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_ids, [ingredient.id])
+
+        ingredient.recipe_set.clear()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredient_ids, [])
+
+    def test_deleted_tag_removed(self):
+        """ Test that deleting a tag removes its id from the recipes """
+        self.recipe.tags.add(self.tag1, self.tag2)
+        self.tag1.delete()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [self.tag2.id])
+
+    def test_backfill_pre_existing_recipe(self):
+        """ Test that a recipe stored before the ids lists its relations once migrated """
+        self.recipe.tags.add(self.tag1)
+        ingredient = sample_ingredient(user=self.user)
+        self.recipe.ingredients.add(ingredient)
+        Recipe.objects.filter(id=self.recipe.id).update(tag_ids=[], ingredient_ids=[], search_document='')
+
+        # Run by the post_migrate hook
+        self.assertEqual(backfill_recipe_relations(), 1)
+        self.assertEqual(backfill_recipe_relations(), 0)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get(RECIPES_URL)
+
+        self.assertEqual(res.data[0]['tags'], [self.tag1.id])
+        self.assertEqual(res.data[0]['ingredients'], [ingredient.id])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.search_document, f'{self.tag1.name} {ingredient.name}')
+
+    def test_sync_command_repairs_recipes(self):
+        """ Test that the command reports then repairs stale ids """
+        self.recipe.tags.add(self.tag1)
+        Recipe.objects.filter(id=self.recipe.id).update(tag_ids=[])
+
+        with self.assertRaises(CommandError):
+            call_command('sync_recipe_relations', '--check', stdout=StringIO())
+
+        call_command('sync_recipe_relations', stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_ids, [self.tag1.id])
+        call_command('sync_recipe_relations', '--check', stdout=StringIO())
+
+    def test_sync_command_repairs_search_document(self):
+        """ Test that the command reports then repairs a stale search document """
+        self.recipe.tags.add(self.tag1)
+        Recipe.objects.filter(id=self.recipe.id).update(search_document='')
+
+        with self.assertRaises(CommandError):
+            call_command('sync_recipe_relations', '--check', stdout=StringIO())
+
+        call_command('sync_recipe_relations', stdout=StringIO())
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.search_document, self.tag1.name)
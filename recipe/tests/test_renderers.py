@@ -0,0 +1,79 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import renderers
+from recipe.renderers import RecipeJSONRenderer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+SAMPLE_DATA = {
+    'title': 'Crème brûlée\u2028',
+    'price': Decimal('5.50'),
+    'created': datetime(2022, 5, 1, 10, 30, 15, 123456, tzinfo=timezone.utc),
+    'tags': [1, 2],
+    'image': None,
+}
+
+
+class RecipeJSONRendererTests(TestCase):
+    """ Test the recipe JSON renderer """
+
+    def test_same_output_as_json_renderer(self):
+        """ Test that the output matches the DRF JSON renderer """
+        expected = JSONRenderer().render(SAMPLE_DATA)
+
+        self.assertEqual(RecipeJSONRenderer().render(SAMPLE_DATA), expected)
+
+    def test_stdlib_fallback(self):
+        """ Test the output without orjson installed """
+        expected = JSONRenderer().render(SAMPLE_DATA)
+
+        with patch.object(renderers, 'orjson', None):
+            self.assertEqual(RecipeJSONRenderer().render(SAMPLE_DATA), expected)
+            self.assertEqual(RecipeJSONRenderer().dumps(SAMPLE_DATA), expected)
+
+    def test_indented_output(self):
+        """ Test that indent requests go through the DRF renderer """
+        output = RecipeJSONRenderer().render(SAMPLE_DATA, 'application/json; indent=4')
+
+        self.assertIn(b'\n    ', output)
+
+    def test_stream_array(self):
+        """ Test that chunks are streamed as a single JSON array """
+        output = b''.join(RecipeJSONRenderer().stream([[{'id': 1}, {'id': 2}], [], [{'id': 3}]]))
+
+        self.assertEqual(json.loads(output), [{'id': 1}, {'id': 2}, {'id': 3}])
+        self.assertEqual(b''.join(RecipeJSONRenderer().stream([])), b'[]')
+
+
+class RecipeStreamTests(TestCase):
+    """ Test the streamed recipe list """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'edward@castle.com',
+            'test123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_stream_matches_list(self):
+        """ Test that the streamed list holds the same recipes as the list """
+        for i in range(5):
+            Recipe.objects.create(user=self.user, title=f'Recipe {i}', time_minutes=i, price=Decimal('1.50'))
+
+        with patch('recipe.views.RecipeViewSet.stream_chunk_size', 2):
+            request = self.client.get(RECIPES_URL, {'stream': 1})
+            streamed = json.loads(b''.join(request.streaming_content))
+
+        self.assertEqual(request['Content-Type'], 'application/json')
+        self.assertEqual(streamed, json.loads(self.client.get(RECIPES_URL).content))
@@ -120,3 +120,78 @@ class PrivateTagsTest(TestCase):
         request = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(request.data), 1)
+
+    def test_paginate_tags_by_name(self):
+        """ Test that tag pages are ordered by name """
+        Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Dinner')
+
+        request = self.client.get(TAGS_URL, {'page_size': 2})
+        self.assertEqual([t['name'] for t in request.data['results']], ['Breakfast', 'Dinner'])
+
+        request = self.client.get(request.data['next'])
+        self.assertEqual([t['name'] for t in request.data['results']], ['Vegan'])
+        self.assertIsNone(request.data['next'])
+
+    def test_bulk_create_tags(self):
+        """ Test creating several tags in one request """
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}]
+
+        request = self.client.post(reverse('recipe:tag-bulk'), payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([t['name'] for t in request.data], ['Dessert', 'Vegan'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_tags_invalid(self):
+        """ Test that an invalid tag rejects the whole batch """
+        payload = [{'name': 'Vegan'}, {'name': ''}]
+
+        request = self.client.post(reverse('recipe:tag-bulk'), payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(request.data[0], {})
+        self.assertFalse(Tag.objects.exists())
+
+    def test_tags_cache_invalidated_on_create(self):
+        """ Test that creating a tag refreshes the cached list """
+        self.client.get(TAGS_URL)
+        self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        request = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in request.data], ['Vegan'])
+
+    def test_create_tag_idempotent(self):
+        """ Test that creating an existing tag returns it instead of a duplicate """
+        first = self.client.post(TAGS_URL, {'name': 'Vegan'})
+        second = self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
+    def test_bulk_upsert_tags(self):
+        """ Test that bulk creation returns existing tags and skips repeated names """
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        payload = [{'name': 'Vegan'}, {'name': 'Dessert'}, {'name': 'Dessert'}]
+
+        request = self.client.post(reverse('recipe:tag-bulk'), payload, format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([t['name'] for t in request.data], ['Dessert', 'Vegan'])
+        self.assertEqual(request.data[1]['id'], existing.id)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_rename_to_existing_name(self):
+        """ Test that renaming a tag to a name in use is rejected """
+        Tag.objects.create(user=self.user, name='Vegan')
+        tag = Tag.objects.create(user=self.user, name='Dessert')
+
+        request = self.client.patch(reverse('recipe:tag-bulk'), [{'id': tag.id, 'name': 'Vegan'}], format='json')
+
+        self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'Dessert')
@@ -0,0 +1,120 @@
+""" Streaming upload of the recipe images """
+import hashlib
+from io import BytesIO
+
+from PIL import Image
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.parsers import MultiPartParser
+
+from recipe.images import image_setting
+
+# Accepted formats, identified by the first bytes of the file
+MAGIC_NUMBERS = (
+    (0, b'\xff\xd8\xff'),
+    (0, b'\x89PNG\r\n\x1a\n'),
+    (0, b'GIF87a'),
+    (0, b'GIF89a'),
+    (8, b'WEBP'),
+)
+
+# Bytes buffered while looking for the image dimensions
+HEADER_LIMIT = 256 * 1024
+
+# Allowance for the multipart boundaries and the other form fields
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'The uploaded image is too large.'
+    default_code = 'image_too_large'
+
+
+def invalid_image(message):
+    return ValidationError({'image': [message]})
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """ Uploaded file on disk, with the SHA-256 of its content """
+
+    content_hash = None
+
+
+class RecipeImageUploadHandler(FileUploadHandler):
+    """ Write the image to disk chunk by chunk, validating and hashing it on the way
+
+    The request is rejected from its Content-Length before the body is read,
+    and the image format and dimensions are checked from the first bytes.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > image_setting('MAX_UPLOAD_SIZE') + MULTIPART_OVERHEAD:
+            raise ImageTooLarge()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.sha256 = hashlib.sha256()
+        self.header = b''
+        self.size = 0
+        self.checked = False
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.size += len(raw_data)
+        if self.size > image_setting('MAX_UPLOAD_SIZE'):
+            raise ImageTooLarge()
+
+        if not self.checked:
+            self._check_header(raw_data)
+
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        if not self.checked:
+            raise invalid_image('Upload a valid image. The file you uploaded was either not an image or a '
+                                'corrupted image.')
+
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.content_hash = self.sha256.hexdigest()
+
+        return self.file
+
+    def _check_header(self, raw_data):
+        self.header += raw_data[:HEADER_LIMIT - len(self.header)]
+        if not any(self.header[offset:offset + len(magic)] == magic for offset, magic in MAGIC_NUMBERS):
+            if len(self.header) >= 12:
+                raise invalid_image('Unsupported image format.')
+            return
+
+        try:
+            width, height = Image.open(BytesIO(self.header)).size
+        except Exception:
+            if len(self.header) >= HEADER_LIMIT:
+                raise invalid_image('Upload a valid image. The file you uploaded was either not an image or a '
+                                    'corrupted image.')
+            return
+
+        max_width, max_height = image_setting('MAX_DIMENSIONS')
+        if width > max_width or height > max_height:
+            raise invalid_image(f'Ensure the image is at most {max_width}x{max_height} pixels.')
+
+        self.checked = True
+        self.header = b''
+
+
+class RecipeImageParser(MultiPartParser):
+    """ Multipart parser streaming the files through RecipeImageUploadHandler """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request.upload_handlers = [RecipeImageUploadHandler(request._request)]
+
+        return super().parse(stream, media_type, parser_context)
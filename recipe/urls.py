@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from recipe import views
+from recipe import async_views, views
 
 router = DefaultRouter()
 router.register('tags', views.TagViewSet)
@@ -9,5 +9,9 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('async/recipes/', async_views.AsyncRecipeListView.as_view(), name='async-recipe-list'),
+    path('async/recipes/<int:pk>/', async_views.AsyncRecipeDetailView.as_view(), name='async-recipe-detail'),
+    path('async/tags/', async_views.AsyncTagListView.as_view(), name='async-tag-list'),
+    path('async/ingredients/', async_views.AsyncIngredientListView.as_view(), name='async-ingredient-list'),
 ]
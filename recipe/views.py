@@ -1,23 +1,51 @@
+from contextlib import suppress
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from core.models import Tag, Ingredient, Recipe
+from recipe.bulk import BulkModelMixin
+from recipe.cache import CachedListMixin, CachedRetrieveMixin
+from recipe.coverage import DEFAULT_COVERAGE_LIMIT, MAX_COVERAGE_LIMIT, rank_by_coverage
+from recipe.export import csv_lines, iter_recipe_records, ndjson_lines
+from recipe.fast_serializers import FastIngredientSerializer, FastRecipeSerializer, FastTagSerializer
+from recipe.filters import filter_recipes
+from recipe.images import release_renditions, schedule_renditions, shared_renditions
+from recipe.pagination import NameCursorPagination, RecipeCursorPagination
+from recipe.params import bool_param, id_list_param, number_param
+from recipe.relations import get_through, sync_linked_recipes, sync_recipe_relations, upsert_names
+from recipe.renderers import RecipeJSONRenderer
 from recipe.serializers import IngredientSerializer, TagSerializer, RecipeSerializer, RecipeDetailSerializer, \
-    RecipeImageSerializer
+    RecipeImageSerializer, BulkRecipeSerializer
+from recipe.uploads import RecipeImageParser
+from user.authentication import CachedTokenAuthentication
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class BaseRecipeAttrViewSet(CachedListMixin, BulkModelMixin, viewsets.GenericViewSet,
+                            mixins.ListModelMixin, mixins.CreateModelMixin):
     """ Viewsets base """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (RecipeJSONRenderer, BrowsableAPIRenderer)
+    pagination_class = NameCursorPagination
+    read_serializer_classes = {}
+
+    def get_serializer_class(self):
+        """ Return the fast read serializer of the action, if there is one """
+        return self.read_serializer_classes.get(self.action, self.serializer_class)
 
     def get_queryset(self):
         """ Return objects for the authenticated user """
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
+        assigned_only = bool_param(self.request.query_params, 'assigned_only')
         queryset = self.queryset
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=False)
@@ -28,15 +56,41 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixi
 
         return self.queryset.filter(user=self.request.user).order_by('name')
 
-    def perform_create(self, serializer):
-        """ Create new Tag """
-        serializer.save(user=self.request.user)
+    def create(self, request, *args, **kwargs):
+        """ Return the object with the same name if there is one, create it otherwise """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        model = serializer.Meta.model
+        instance, created = model.objects.get_or_create(user=request.user, name=serializer.validated_data['name'])
+
+        return Response(
+            self.get_serializer(instance).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+
+    def perform_bulk_create(self, validated):
+        """ Upsert the names, existing objects are returned instead of duplicated """
+        model = self.bulk_serializer_class.Meta.model
+        names = [data['name'] for data in validated]
+
+        return upsert_names(model, self.request.user, names, self.bulk_batch_size)
+
+    def perform_bulk_update(self, instances, validated):
+        """ Rename the objects, rejecting names already in use """
+        try:
+            with transaction.atomic():
+                super().perform_bulk_update(instances, validated)
+        except IntegrityError:
+            raise ValidationError({'name': ['Names must be unique.']})
+        sync_linked_recipes(self.bulk_serializer_class.Meta.model, [instance.pk for instance in instances])
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """ Tag handler in the database """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    bulk_serializer_class = TagSerializer
+    read_serializer_classes = {'list': FastTagSerializer}
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -44,36 +98,164 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    bulk_serializer_class = IngredientSerializer
+    read_serializer_classes = {'list': FastIngredientSerializer}
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedListMixin, CachedRetrieveMixin, BulkModelMixin, viewsets.ModelViewSet):
     """ Recipe handler in the database """
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    renderer_classes = (RecipeJSONRenderer, BrowsableAPIRenderer)
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-
-    def get_queryset(self):
-        """ Return Ingredients objects for the authenticated user """
-        return self.queryset.filter(user=self.request.user)
+    bulk_serializer_class = BulkRecipeSerializer
+    pagination_class = RecipeCursorPagination
+    # Fast read-only serializers used instead of the ModelSerializers per action
+    read_serializer_classes = {'list': FastRecipeSerializer, 'coverage': FastRecipeSerializer}
+    relation_fields = {'tags': Tag, 'ingredients': Ingredient}
+    # Recipes read per query of the streamed list
+    stream_chunk_size = 2000
+    # Export format -> (content type, line generator)
+    export_formats = {
+        'ndjson': ('application/x-ndjson', ndjson_lines),
+        'csv': ('text/csv', csv_lines),
+    }
 
     def get_serializer_class(self):
         """ Return the apropied serializer """
 
-        if self.action == 'retrieve':
+        if self.action in self.read_serializer_classes:
+            return self.read_serializer_classes[self.action]
+
+        elif self.action == 'retrieve':
             return RecipeDetailSerializer
 
-        elif self.action == 'upload-image':
+        elif self.action == 'upload_image':
             return RecipeImageSerializer
 
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        """ List the recipes, as a streamed JSON array when asked with stream=1 """
+        if not bool_param(request.query_params, 'stream'):
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = FastRecipeSerializer(context=self.get_serializer_context())
+        chunks = serializer.iter_chunks(queryset, self.stream_chunk_size)
+
+        return StreamingHttpResponse(
+            RecipeJSONRenderer().stream(chunks),
+            content_type=RecipeJSONRenderer.media_type
+        )
+
     def perform_create(self, serializer):
         """ Create new Ingredient """
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def get_bulk_serializer_context(self, items):
+        """ Load the tags and ingredients of the batch with one query per relation
+
+        The related fields of the serializers validate each item against these objects.
+        """
+        context = super().get_bulk_serializer_context(items)
+        context['related_objects'] = {}
+        for field, model in self.relation_fields.items():
+            requested = set()
+            for item in items:
+                values = item.get(field) if isinstance(item, dict) else None
+                for value in values if isinstance(values, list) else ():
+                    with suppress(DjangoValidationError):
+                        requested.add(model._meta.pk.to_python(value))
+            context['related_objects'][model] = model.objects.filter(user=self.request.user).in_bulk(requested)
+
+        return context
+
+    def perform_bulk_create(self, validated):
+        """ Insert the recipes, then their tag and ingredient links """
+        relations = [{field: data.pop(field, []) for field in self.relation_fields} for data in validated]
+        recipes = super().perform_bulk_create(validated)
+        self._bulk_set_relations(recipes, relations)
+
+        return recipes
+
+    def perform_bulk_update(self, instances, validated):
+        """ Update the recipes and replace the relations sent for each one """
+        relations = [
+            {field: data.pop(field) for field in self.relation_fields if field in data}
+            for data in validated
+        ]
+        super().perform_bulk_update(instances, validated)
+        self._bulk_set_relations(instances, relations, replace=True)
+
+    def _bulk_set_relations(self, recipes, relations, replace=False):
+        changed_recipes = set()
+        for field in self.relation_fields:
+            through, recipe_column, related_column = get_through(field)
+            changed = [(recipe, rel[field]) for recipe, rel in zip(recipes, relations) if field in rel]
+            changed_recipes.update(recipe.pk for recipe, _ in changed)
+
+            if replace and changed:
+                through.objects.filter(**{f'{recipe_column}__in': [recipe.pk for recipe, _ in changed]}).delete()
+
+            links = [
+                through(**{recipe_column: recipe.pk, related_column: related.pk})
+                for recipe, objs in changed
+                for related in objs
+            ]
+            through.objects.bulk_create(links, batch_size=self.bulk_batch_size)
+
+        sync_recipe_relations(changed_recipes)
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    @method_decorator(gzip_page)
+    def export(self, request):
+        """ Stream every recipe of the user with its tags and ingredients """
+        export_format = request.query_params.get('type', 'ndjson')
+        if export_format not in self.export_formats:
+            raise ValidationError({'type': f'Must be one of: {", ".join(self.export_formats)}.'})
+
+        content_type, encode = self.export_formats[export_format]
+        queryset = Recipe.objects.filter(user=request.user).order_by('id')
+        response = StreamingHttpResponse(
+            encode(iter_recipe_records(queryset, self.stream_chunk_size)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="recipes.{export_format}"'
+
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='coverage')
+    def coverage(self, request):
+        """ Rank the recipes by the share of their ingredients among the given ones """
+        params = request.query_params
+        owned = id_list_param(params, 'ingredients')
+        if owned is None:
+            raise ValidationError({'ingredients': 'This parameter is required.'})
+        min_coverage = number_param(params, 'min_coverage', float, 0.0, 0, 1)
+        limit = number_param(params, 'limit', int, DEFAULT_COVERAGE_LIMIT, 1, MAX_COVERAGE_LIMIT)
+        owned = set(owned)
+
+        ranking = rank_by_coverage(self.get_queryset(), owned, min_coverage, limit)
+        recipes = Recipe.objects.filter(pk__in=[pk for pk, *_ in ranking])
+        data = {
+            recipe['id']: recipe
+            for recipe in self.get_serializer(recipes, many=True).data
+        }
+        results = []
+        for pk, _, _, coverage in ranking:
+            recipe = data[pk]
+            recipe['coverage'] = coverage
+            recipe['missing_ingredients'] = [
+                ingredient for ingredient in recipe['ingredients'] if ingredient not in owned
+            ]
+            results.append(recipe)
+
+        return Response(results)
+
+    @action(methods=['POST'], detail=True, url_path='upload-image', parser_classes=[RecipeImageParser])
     def upload_image(self, request, pk=None):
         """ Upload image to recipe """
         recipe = self.get_object()
@@ -83,7 +265,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
+            previous_image, previous_renditions = recipe.image.name, recipe.image_renditions
             serializer.save()
+            if recipe.image.name != previous_image or not previous_renditions:
+                release_renditions(recipe, previous_image, previous_renditions)
+                recipe.image_renditions = shared_renditions(recipe)
+                recipe.save(update_fields=['image_renditions'])
+                if not recipe.image_renditions:
+                    schedule_renditions(recipe)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -94,20 +283,31 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    @staticmethod
-    def _params_to_ints(qs):
-        """ Convert string list ids to ints list integers """
-        return [int(str_id) for str_id in qs.split(',')]
-
     def get_queryset(self):
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tags_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_ids)
-        if ingredients:
-            ingredients_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_ids)
-
-        return queryset.filter(user=self.request.user)
+        """ Return recipes of the authenticated user, prefetched for the current action """
+        queryset = filter_recipes(self.queryset.filter(user=self.request.user), self.request.query_params)
+
+        return self._prefetch_for_action(queryset)
+
+    def _prefetch_for_action(self, queryset):
+        """ Attach the related objects the serializer of the action will read """
+        if self.action == 'destroy':
+            return queryset
+
+        if self.action == 'upload_image':
+            return queryset.only('id', 'user', 'image', 'image_hash', 'image_renditions')
+
+        if self.action in self.read_serializer_classes:
+            return queryset
+
+        if self.action == 'retrieve':
+            tags = Tag.objects.only('id', 'name').order_by('id')
+            ingredients = Ingredient.objects.only('id', 'name').order_by('id')
+        else:
+            tags = Tag.objects.only('id').order_by('id')
+            ingredients = Ingredient.objects.only('id').order_by('id')
+
+        return queryset.prefetch_related(
+            Prefetch('tags', queryset=tags),
+            Prefetch('ingredients', queryset=ingredients)
+        )
@@ -0,0 +1,76 @@
+""" Async views, served without a thread per request under ASGI
+
+DRF views are synchronous, so these are plain Django async views doing the
+same authentication, error responses and JSON rendering as the API views.
+"""
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+
+from user.authentication import CachedTokenAuthentication
+from user.serializers import UserSerializer
+
+
+class AsyncAPIView(View):
+    """ Async view authenticated by token, whose handlers return the data to render """
+
+    authentication_class = CachedTokenAuthentication
+    renderer_class = JSONRenderer
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+
+        try:
+            await self.authenticate(request)
+            result = await handler(request, *args, **kwargs)
+        except Http404 as exc:
+            return self.handle_exception(exceptions.NotFound(*exc.args))
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+        # The handlers of View, as options(), return their own response
+        if isinstance(result, HttpResponse):
+            return result
+        return self.render(result)
+
+    async def authenticate(self, request):
+        """ Set the user and token of the request, or raise NotAuthenticated """
+        authenticator = self.authentication_class()
+        try:
+            user_auth = await authenticator.aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            exc.auth_header = authenticator.authenticate_header(request)
+            raise
+        if user_auth is None:
+            exc = exceptions.NotAuthenticated()
+            exc.auth_header = authenticator.authenticate_header(request)
+            raise exc
+
+        request.user, request.auth = user_auth
+
+    def handle_exception(self, exc):
+        """ Return the error response of an API exception, as DRF would """
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {'detail': exc.detail}
+        response = self.render(data, exc.status_code)
+        if getattr(exc, 'auth_header', None):
+            response['WWW-Authenticate'] = exc.auth_header
+
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        renderer = self.renderer_class()
+        return HttpResponse(renderer.render(data), content_type=renderer.media_type, status=status_code)
+
+
+class AsyncManageUserView(AsyncAPIView):
+    """ Async read of the authenticated user """
+
+    async def get(self, request):
+        return UserSerializer(request.user).data
@@ -0,0 +1,265 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.authtoken.models import Token
+
+DEFAULTS = {
+    # Number of tokens kept in the in-process LRU
+    'MAX_SIZE': 1024,
+    # Seconds a resolved token is trusted before hitting the database again
+    'TIMEOUT': 60,
+    # Django cache alias used as a shared tier, None to disable it
+    'CACHE_ALIAS': None,
+}
+
+
+EXPIRY_DEFAULTS = {
+    # Seconds a token is valid after its creation or last renewal, None never expires
+    'EXPIRES': None,
+    # Renew the tokens used past half their lifetime, so only idle tokens expire
+    'SLIDING': True,
+}
+
+
+def token_cache_setting(name):
+    """ Return a TOKEN_AUTH_CACHE setting, falling back to the default """
+    return getattr(settings, 'TOKEN_AUTH_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def token_expiry_setting(name):
+    """ Return a TOKEN_EXPIRY setting, falling back to the default """
+    return getattr(settings, 'TOKEN_EXPIRY', {}).get(name, EXPIRY_DEFAULTS[name])
+
+
+def token_age(token):
+    return (timezone.now() - token.created).total_seconds()
+
+
+def is_expired(token):
+    expires = token_expiry_setting('EXPIRES')
+    return expires is not None and token_age(token) >= expires
+
+
+def refresh_due(token):
+    """ Return whether a token in use should be renewed """
+    expires = token_expiry_setting('EXPIRES')
+    return expires is not None and token_expiry_setting('SLIDING') and token_age(token) >= expires / 2
+
+
+def token_digest(key):
+    """ Hash a token key so raw tokens are never used as cache keys """
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class LRUCache:
+    """ Thread safe, size bounded cache with a time to live per entry """
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, max_size):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TokenCache:
+    """ Two tier cache of resolved tokens: in-process LRU, then a Django cache
+
+    Entries are keyed by a digest of the token and hold neither the raw key
+    nor the password hash: only the token creation time and the other fields
+    of its user, from which a new token and user are built for each request.
+    """
+
+    key_prefix = 'auth-token'
+
+    def __init__(self):
+        self.local = LRUCache()
+
+    @staticmethod
+    def shared():
+        alias = token_cache_setting('CACHE_ALIAS')
+        return caches[alias] if alias else None
+
+    def get(self, key):
+        """ Return the cached token with the key, or None """
+        digest = token_digest(key)
+        entry = self.local.get(digest)
+        if entry is None:
+            shared = self.shared()
+            entry = shared.get(f'{self.key_prefix}:{digest}') if shared is not None else None
+            if entry is not None:
+                self._set_local(digest, entry)
+
+        return None if entry is None else self.build_token(key, entry)
+
+    async def aget(self, key):
+        """ Async equivalent of get() """
+        digest = token_digest(key)
+        entry = self.local.get(digest)
+        if entry is None:
+            shared = self.shared()
+            entry = await shared.aget(f'{self.key_prefix}:{digest}') if shared is not None else None
+            if entry is not None:
+                self._set_local(digest, entry)
+
+        return None if entry is None else self.build_token(key, entry)
+
+    def set(self, token):
+        """ Store the token, with its user, in every tier """
+        digest, entry = token_digest(token.key), self.build_entry(token)
+        self._set_local(digest, entry)
+        shared = self.shared()
+        if shared is not None:
+            shared.set(f'{self.key_prefix}:{digest}', entry, token_cache_setting('TIMEOUT'))
+
+    async def aset(self, token):
+        """ Async equivalent of set() """
+        digest, entry = token_digest(token.key), self.build_entry(token)
+        self._set_local(digest, entry)
+        shared = self.shared()
+        if shared is not None:
+            await shared.aset(f'{self.key_prefix}:{digest}', entry, token_cache_setting('TIMEOUT'))
+
+    def invalidate(self, key):
+        """ Forget the token with the given raw key """
+        digest = token_digest(key)
+        self.local.delete(digest)
+        shared = self.shared()
+        if shared is not None:
+            shared.delete(f'{self.key_prefix}:{digest}')
+
+    @staticmethod
+    def build_entry(token):
+        """ Return the cached form of a token: its creation time and its user without the password """
+        user = token.user
+        user_fields = {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname != 'password'
+        }
+
+        return {'created': token.created, 'user': user_fields}
+
+    @staticmethod
+    def build_token(key, entry):
+        """ Return a new token and user from a cached entry, the password left deferred """
+        user_model = get_user_model()
+        user = user_model.from_db(router.db_for_read(user_model), list(entry['user']), list(entry['user'].values()))
+
+        return Token(key=key, user=user, created=entry['created'])
+
+    def _set_local(self, digest, entry):
+        self.local.set(
+            digest,
+            entry,
+            token_cache_setting('TIMEOUT'),
+            token_cache_setting('MAX_SIZE')
+        )
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ Token authentication resolving warm tokens without database queries
+
+    Entries are dropped when the token is deleted or its user is saved, and
+    expire after TOKEN_AUTH_CACHE['TIMEOUT'] seconds in other processes.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        # A cached token may have been renewed by another process
+        if token is None or is_expired(token):
+            user, token = super().authenticate_credentials(key)
+            if is_expired(token):
+                raise exceptions.AuthenticationFailed(_('Token has expired.'))
+            token_cache.set(token)
+
+        if refresh_due(token):
+            token.created = timezone.now()
+            self.get_model().objects.filter(key=key).update(created=token.created)
+            token_cache.set(token)
+
+        return token.user, token
+
+    async def aauthenticate(self, request):
+        """ Async equivalent of authenticate(), for the async views """
+        key = self.get_key(request)
+        if key is None:
+            return None
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        token = await token_cache.aget(key)
+        if token is None or is_expired(token):
+            try:
+                token = await self.get_model().objects.select_related('user').aget(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+            if is_expired(token):
+                raise exceptions.AuthenticationFailed(_('Token has expired.'))
+            await token_cache.aset(token)
+
+        if refresh_due(token):
+            token.created = timezone.now()
+            await self.get_model().objects.filter(key=key).aupdate(created=token.created)
+            await token_cache.aset(token)
+
+        return token.user, token
+
+    def get_key(self, request):
+        """ Return the token key of the Authorization header, None without one """
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        elif len(auth) > 2:
+            raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+
+        try:
+            return auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                _('Invalid token header. Token string should not contain invalid characters.')
+            )
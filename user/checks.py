@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from user.throttling import login_setting
+
+LOCAL_MEMORY_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.security, deploy=True)
+def check_login_throttle_cache(app_configs, **kwargs):
+    """ Fail the deployment checks when the login throttles count in a per process cache """
+    alias = login_setting('CACHE_ALIAS')
+    if settings.CACHES.get(alias, {}).get('BACKEND') != LOCAL_MEMORY_BACKEND:
+        return []
+
+    return [Error(
+        f"LOGIN_THROTTLE['CACHE_ALIAS'] {alias!r} is a local memory cache.",
+        hint=(
+            'Each process counts the login attempts on its own, multiplying the rates by the number of '
+            'workers. Point it to a cache shared by the processes, e.g. set CACHE_REDIS_URL.'
+        ),
+        id='user.E001',
+    )]
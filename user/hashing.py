@@ -0,0 +1,95 @@
+""" Password hashing of the API run in a bounded pool of threads
+
+The hashers of PASSWORD_HASHERS built on PooledHasherMixin hash in the pool
+inside a pooled() block, which the API serializers open around
+authenticate(), create_user() and set_password(). Elsewhere, as in the
+admin and the management commands, they hash in the calling thread.
+
+The request thread waits for the result, so the pool does not take the work
+off it: it caps the hashes computed at once, and the number of hashes
+waiting for a worker. Past that, requests are answered with a 429 instead
+of queueing without bound.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import Throttled
+
+DEFAULTS = {
+    'WORKERS': 4,
+    # Hashes waiting for a worker before new ones are rejected
+    'MAX_PENDING': 16,
+    # Seconds suggested to the client in the Retry-After header
+    'RETRY_AFTER': 1,
+    # Hash in the pool, False hashes in the calling thread
+    'ASYNC': True,
+}
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+_pooled = contextvars.ContextVar('pooled_password_hashing', default=False)
+
+
+class PasswordHashingBusy(Throttled):
+    default_detail = 'Too many logins in progress.'
+
+
+def hashing_setting(name):
+    """ Return a PASSWORD_HASHING setting, falling back to the default """
+    return getattr(settings, 'PASSWORD_HASHING', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    """ Return the worker pool and the semaphore of its slots, created on first use """
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = hashing_setting('WORKERS')
+            _slots = threading.BoundedSemaphore(workers + hashing_setting('MAX_PENDING'))
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+    return _executor, _slots
+
+
+@contextmanager
+def pooled():
+    """ Hash the passwords of the block in the pool, raising PasswordHashingBusy when full """
+    token = _pooled.set(True)
+    try:
+        yield
+    finally:
+        _pooled.reset(token)
+
+
+def run_hashing(func, *args):
+    """ Return func(*args), run in the pool inside a pooled() block """
+    if not _pooled.get() or not hashing_setting('ASYNC'):
+        return func(*args)
+
+    executor, slots = get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHashingBusy(wait=hashing_setting('RETRY_AFTER'))
+    try:
+        # The workers do not inherit the context, the hasher runs there directly
+        return executor.submit(func, *args).result()
+    finally:
+        slots.release()
+
+
+class PooledHasherMixin:
+    """ Run the encoding and verification of a Django hasher through run_hashing """
+
+    def encode(self, password, salt, *args):
+        return run_hashing(super().encode, password, salt, *args)
+
+    def verify(self, password, encoded):
+        return run_hashing(super().verify, password, encoded)
+
+
+class PooledPBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 
+from user import hashing
+from user.throttling import failure_key, is_known_failure, remember_failure
+
 
 class UserSerializer(serializers.ModelSerializer):
     """ Serializer for User Object """
@@ -11,21 +14,21 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True, 'min_length': 5}}
 
     def create(self, validated_data):
-        """ Create and return user with encrypted password """
+        """ Create and return user with the password hashed in the pool """
 
-        return get_user_model().objects.create_user(**validated_data)
+        with hashing.pooled():
+            return get_user_model().objects.create_user(**validated_data)
 
     def update(self, instance, validated_data):
         """ Update user, and configure password correctly """
 
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            # Hashed before any change, a busy pool leaves the user untouched
+            with hashing.pooled():
+                instance.set_password(password)
 
-        return user
+        return super().update(instance, validated_data)
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -39,10 +42,16 @@ class AuthTokenSerializer(serializers.Serializer):
 
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(request=self.context.get('request'), username=email, password=password)
+        msg = 'Unable to authenticate with provided connection'
+        key = failure_key(email, password)
+        if is_known_failure(key):
+            raise serializers.ValidationError(msg, code='authorization')
+
+        with hashing.pooled():
+            user = authenticate(request=self.context.get('request'), username=email, password=password)
 
         if not user:
-            msg = 'Unable to authenticate with provided connection'
+            remember_failure(key)
             raise serializers.ValidationError(msg, code='authorization')
 
         attrs['user'] = user
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache, token_digest
+
+MY_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ Test the cached token authentication """
+
+    def setUp(self):
+        token_cache.local.clear()
+        self.user = get_user_model().objects.create_user(
+            email='edward@castle.com',
+            password='test123',
+            name='edward'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_token_no_queries(self):
+        """ Test that a warm token is resolved without the database """
+        self.client.get(MY_URL)
+
+        with self.assertNumQueries(0):
+            request = self.client.get(MY_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request.data['email'], self.user.email)
+
+    def test_invalid_token(self):
+        """ Test that an unknown token is rejected """
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        request = self.client.get(MY_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """ Test that deleting the token logs the user out immediately """
+        self.client.get(MY_URL)
+        self.token.delete()
+
+        request = self.client.get(MY_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """ Test that updating the user refreshes the cached user """
+        self.client.get(MY_URL)
+        self.client.patch(MY_URL, {'name': 'newname', 'password': 'newpass'})
+
+        request = self.client.get(MY_URL)
+
+        self.assertEqual(request.data['name'], 'newname')
+
+    def test_inactive_user_rejected_after_save(self):
+        """ Test that deactivating a user is picked up on the next request """
+        self.client.get(MY_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        request = self.client.get(MY_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'CACHE_ALIAS': 'default'})
+    def test_shared_cache_tier(self):
+        """ Test that the shared cache serves tokens missing from the LRU """
+        self.client.get(MY_URL)
+        token_cache.local.clear()
+
+        with self.assertNumQueries(0):
+            request = self.client.get(MY_URL)
+
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        token_cache.invalidate(self.token.key)
+
+    def test_cache_holds_no_secrets(self):
+        """ Test that cached entries hold neither the raw token nor the password hash """
+        self.client.get(MY_URL)
+
+        entry = token_cache.local.get(token_digest(self.token.key))
+        self.assertNotIn(self.token.key, repr(entry))
+        self.assertNotIn(self.user.password, repr(entry))
+        self.assertEqual(entry['user']['id'], self.user.id)
+
+    def test_new_user_per_request(self):
+        """ Test that each request gets its own user object, with the password deferred """
+        self.client.get(MY_URL)
+
+        first = token_cache.get(self.token.key).user
+        second = token_cache.get(self.token.key).user
+        self.assertIsNot(first, second)
+        self.assertEqual(first, self.user)
+        self.assertIn('password', first.get_deferred_fields())
@@ -0,0 +1,125 @@
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import hashing
+
+TOKEN_URL = reverse('user:token')
+CREATE_USER_URL = reverse('user:create')
+
+PASSWORD_HASHERS = [
+    'user.hashing.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 1, 'MAX_PENDING': 0, 'RETRY_AFTER': 3})
+class PasswordHashingTests(TestCase):
+    """ Test the password hashing pool """
+
+    def setUp(self):
+        # Start from empty login throttles
+        cache.clear()
+        self.client = APIClient()
+        # Start every test from a new pool sized by its settings
+        patcher = patch.multiple(hashing, _executor=None, _slots=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hash_in_pool(self):
+        """ Test that hashes are computed by the workers in a pooled block only """
+        with hashing.pooled():
+            self.assertTrue(hashing.run_hashing(threading.current_thread).name.startswith('password-hashing'))
+
+        self.assertIs(hashing.run_hashing(threading.current_thread), threading.current_thread())
+
+    def test_login_through_authentication_backends(self):
+        """ Test that logins go through authenticate(), its checks and signals """
+        get_user_model().objects.create_user('test@gmail.com', 'testpass', is_active=False)
+        failures = []
+
+        def login_failed(sender, credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(login_failed)
+        self.addCleanup(user_login_failed.disconnect, login_failed)
+
+        response = self.client.post(TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(failures, ['test@gmail.com'])
+
+    def test_login_rejected_when_saturated(self):
+        """ Test that logins past the pending limit are answered with a 429 """
+        get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        _, slots = hashing.get_executor()
+        slots.acquire()
+        try:
+            response = self.client.post(TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'})
+        finally:
+            slots.release()
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '3')
+
+        response = self.client.post(TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_signup_rejected_when_saturated(self):
+        """ Test that signups past the pending limit are answered with a 429 """
+        _, slots = hashing.get_executor()
+        slots.acquire()
+        try:
+            response = self.client.post(
+                CREATE_USER_URL, {'email': 'test@gmail.com', 'password': 'testpass', 'name': 'Test'}
+            )
+        finally:
+            slots.release()
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_model_hashing_outside_pool(self):
+        """ Test that the User model, used by the admin and createsuperuser, does not use the pool """
+        _, slots = hashing.get_executor()
+        slots.acquire()
+        try:
+            user = get_user_model().objects.create_superuser('admin@gmail.com', 'testpass')
+            self.assertTrue(user.check_password('testpass'))
+        finally:
+            slots.release()
+
+    @override_settings(PASSWORD_HASHERS=PASSWORD_HASHERS)
+    def test_rehash_on_login(self):
+        """ Test that a hash of another hasher is replaced by the preferred one on login """
+        user = get_user_model().objects.create_user('test@gmail.com')
+        user.password = make_password('testpass', hasher='md5')
+        user.save()
+
+        response = self.client.post(TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('testpass'))
+
+    @override_settings(PASSWORD_HASHERS=PASSWORD_HASHERS)
+    def test_no_rehash_on_failed_login(self):
+        """ Test that a wrong password keeps the stored hash """
+        user = get_user_model().objects.create_user('test@gmail.com')
+        user.password = encoded = make_password('testpass', hasher='md5')
+        user.save()
+
+        response = self.client.post(TOKEN_URL, {'email': 'test@gmail.com', 'password': 'wrong'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        user.refresh_from_db()
+        self.assertEqual(user.password, encoded)
@@ -0,0 +1,152 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user.checks import check_login_throttle_cache
+from user.throttling import login_metrics
+
+TOKEN_URL = reverse('user:token')
+METRICS_URL = reverse('user:token-metrics')
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'login': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'login-throttle-tests'},
+}
+
+
+@override_settings(
+    CACHES=CACHES,
+    LOGIN_THROTTLE={'CACHE_ALIAS': 'login', 'RATES': {'login_ip': '5/min', 'login_email': '3/min'}}
+)
+class LoginThrottleTests(TestCase):
+    """ Test the throttling and failed login cache of the token endpoint """
+
+    def setUp(self):
+        caches['login'].clear()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        self.client = APIClient()
+
+    def login(self, email='test@gmail.com', password='testpass', ip='10.0.0.1'):
+        return self.client.post(TOKEN_URL, {'email': email, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_throttle_per_email(self):
+        """ Test that attempts on an email are limited across client IPs """
+        for i in range(3):
+            self.assertEqual(self.login(ip=f'10.0.0.{i}').status_code, status.HTTP_200_OK)
+
+        response = self.login(ip='10.0.0.9')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login(email='other@gmail.com').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(login_metrics()['throttled_login_email'], 1)
+
+    def test_throttle_per_ip(self):
+        """ Test that attempts from a client IP are limited across emails """
+        for i in range(5):
+            self.login(email=f'user{i}@gmail.com')
+
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(ip='10.0.0.2').status_code, status.HTTP_200_OK)
+        self.assertEqual(login_metrics()['throttled_login_ip'], 1)
+
+    def test_throttle_per_ip_ignores_forwarded_for(self):
+        """ Test that a client cannot reset its limit with a new X-Forwarded-For header """
+        for i in range(5):
+            self.client.post(
+                TOKEN_URL, {'email': f'user{i}@gmail.com', 'password': 'testpass'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.168.0.{i}'
+            )
+
+        response = self.client.post(
+            TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.9'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_throttle_per_ip_behind_proxy(self):
+        """ Test that the client IP is read from X-Forwarded-For behind NUM_PROXIES proxies """
+        with patch('rest_framework.settings.api_settings.NUM_PROXIES', 1):
+            for i in range(5):
+                self.client.post(
+                    TOKEN_URL, {'email': f'user{i}@gmail.com', 'password': 'testpass'},
+                    REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.1'
+                )
+            blocked = self.client.post(
+                TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.1'
+            )
+            other_client = self.client.post(
+                TOKEN_URL, {'email': 'test@gmail.com', 'password': 'testpass'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.168.0.2'
+            )
+
+        self.assertEqual(blocked.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other_client.status_code, status.HTTP_200_OK)
+
+    def test_known_failure_skips_hashing(self):
+        """ Test that repeating failed credentials does not hash the password again """
+        self.assertEqual(self.login(password='wrong').status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('django.contrib.auth.hashers.check_password') as check_password:
+            response = self.login(password='wrong', ip='10.0.0.2')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        check_password.assert_not_called()
+        self.assertEqual(login_metrics()['failures'], 1)
+        self.assertEqual(login_metrics()['known_failures'], 1)
+
+    def test_known_failure_forgotten_on_password_change(self):
+        """ Test that a failed password becomes valid once it is set """
+        self.login(password='newpass')
+        self.user.set_password('newpass')
+        self.user.save()
+
+        self.assertEqual(self.login(password='newpass', ip='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    def test_known_failure_forgotten_on_signup(self):
+        """ Test that a failed login on an unknown email succeeds once the user exists """
+        self.login(email='new@gmail.com')
+        get_user_model().objects.create_user('new@gmail.com', 'testpass')
+
+        self.assertEqual(self.login(email='new@gmail.com', ip='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    def test_metrics_staff_only(self):
+        """ Test that the metrics are only readable by the staff """
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['failures'], 0)
+
+
+class LoginThrottleCacheCheckTests(SimpleTestCase):
+    """ Test the deployment check of the login throttle cache """
+
+    @override_settings(LOGIN_THROTTLE={'CACHE_ALIAS': 'login'}, CACHES=CACHES)
+    def test_local_memory_cache_fails(self):
+        """ Test that a per process cache fails the check """
+        errors = check_login_throttle_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['user.E001'])
+
+    @override_settings(
+        LOGIN_THROTTLE={'CACHE_ALIAS': 'login'},
+        CACHES={**CACHES, 'login': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://localhost:6379',
+        }}
+    )
+    def test_shared_cache_passes(self):
+        """ Test that a cache shared by the processes passes the check """
+        self.assertEqual(check_login_throttle_cache(None), [])
@@ -0,0 +1,118 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache
+
+TOKEN_URL = reverse('user:token')
+MY_URL = reverse('user:me')
+ASYNC_MY_URL = reverse('user:async-me')
+
+
+class TokenServiceTests(TestCase):
+    """ Test the issuance and expiry of the tokens """
+
+    def setUp(self):
+        # Start from empty login throttles
+        cache.clear()
+        token_cache.local.clear()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass')
+        self.client = APIClient()
+
+    def login(self, email='test@gmail.com'):
+        response = self.client.post(TOKEN_URL, {'email': email, 'password': 'testpass'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def set_token_age(self, key, seconds):
+        Token.objects.filter(key=key).update(created=timezone.now() - timedelta(seconds=seconds))
+        token_cache.local.clear()
+
+    def test_login_returns_issued_token_without_writes(self):
+        """ Test that logging in again reuses the token without writing """
+        key = self.login()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.login(), key)
+
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_issued_token_dropped_on_logout(self):
+        """ Test that a deleted token is not issued again """
+        key = self.login()
+        Token.objects.filter(key=key).delete()
+
+        self.assertNotEqual(self.login(), key)
+
+    def test_token_deleted_by_another_process_not_issued(self):
+        """ Test that a token deleted without signals in this process is not issued again """
+        key = self.login()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Token._meta.db_table}')
+
+        new_key = self.login()
+        self.assertNotEqual(new_key, key)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {new_key}')
+        self.assertEqual(self.client.get(MY_URL).status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_EXPIRY={'EXPIRES': 60, 'SLIDING': True})
+    def test_expired_token_rejected_and_rotated(self):
+        """ Test that an expired token is refused, and replaced at the next login """
+        key = self.login()
+        self.set_token_age(key, 120)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        response = self.client.get(MY_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        new_key = self.login()
+        self.assertNotEqual(new_key, key)
+        self.assertFalse(Token.objects.filter(key=key).exists())
+
+    @override_settings(TOKEN_EXPIRY={'EXPIRES': 60, 'SLIDING': True})
+    def test_sliding_refresh(self):
+        """ Test that a token used past half its lifetime is renewed """
+        key = self.login()
+        self.set_token_age(key, 40)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(self.client.get(MY_URL).status_code, status.HTTP_200_OK)
+
+        age = timezone.now() - Token.objects.get(key=key).created
+        self.assertLess(age, timedelta(seconds=10))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(MY_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+    @override_settings(TOKEN_EXPIRY={'EXPIRES': 60, 'SLIDING': False})
+    def test_fixed_lifetime(self):
+        """ Test that without sliding a used token still expires """
+        key = self.login()
+        self.set_token_age(key, 40)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.assertEqual(self.client.get(MY_URL).status_code, status.HTTP_200_OK)
+        self.assertLess(Token.objects.get(key=key).created, timezone.now() - timedelta(seconds=30))
+
+    @override_settings(TOKEN_EXPIRY={'EXPIRES': 60, 'SLIDING': True})
+    async def test_expired_token_async(self):
+        """ Test that the async views refuse expired tokens """
+        token = await Token.objects.acreate(user=self.user)
+        await Token.objects.filter(key=token.key).aupdate(created=timezone.now() - timedelta(seconds=120))
+
+        response = await self.async_client.get(ASYNC_MY_URL, headers={'Authorization': f'Token {token.key}'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -1,12 +1,17 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
 MY_URL = reverse('user:me')
+ASYNC_MY_URL = reverse('user:async-me')
 
 
 def create_user(**params):
@@ -17,6 +22,8 @@ class PublicUserApi(TestCase):
     """ Test Public User API """
 
     def setUp(self):
+        # Start from empty login throttles
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -162,3 +169,37 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+
+class AsyncUserApiTests(TestCase):
+    """ Test the async read of the authenticated user """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'testpass', name='Test')
+        self.token = Token.objects.create(user=self.user)
+
+    def tearDown(self):
+        token_cache.local.clear()
+
+    async def test_retrieve_profile(self):
+        """ Test reading the profile with a token, then from the token cache """
+        headers = {'Authorization': f'Token {self.token.key}'}
+        for _ in range(2):
+            response = await self.async_client.get(ASYNC_MY_URL, headers=headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), {'email': 'test@gmail.com', 'name': 'Test'})
+
+    async def test_retrieve_profile_unauthorized(self):
+        """ Test that the profile requires a token """
+        response = await self.async_client.get(ASYNC_MY_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_profile_options(self):
+        """ Test that OPTIONS on the profile lists the allowed methods """
+        response = await self.async_client.options(
+            ASYNC_MY_URL, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Allow'], 'GET, HEAD, OPTIONS')
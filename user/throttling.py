@@ -0,0 +1,138 @@
+""" Throttling of the token endpoint and cache of the failed logins
+
+Attempts are rate limited per client IP and per email with the sliding
+window throttles of DRF. A failed login is remembered under a digest of the
+email, the password and the stored password hash, so retrying the same
+credentials is rejected without hashing, until the password of the user
+changes or the user gets created.
+"""
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+DEFAULTS = {
+    'CACHE_ALIAS': 'default',
+    # Throttle rate per scope, None to disable it
+    'RATES': {
+        'login_ip': '60/min',
+        'login_email': '10/min',
+    },
+    # Seconds a failed login is remembered
+    'FAILURE_TIMEOUT': 300,
+}
+
+# Counters of the rejected attempts
+METRICS = ('throttled_login_ip', 'throttled_login_email', 'known_failures', 'failures')
+
+
+def login_setting(name):
+    """ Return a LOGIN_THROTTLE setting, falling back to the default """
+    return getattr(settings, 'LOGIN_THROTTLE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[login_setting('CACHE_ALIAS')]
+
+
+def record(metric):
+    """ Count a rejected attempt """
+    key = f'login-metrics:{metric}'
+    cache = get_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.add(key, 1, None)
+
+
+def login_metrics():
+    """ Return the counters of rejected attempts """
+    values = get_cache().get_many([f'login-metrics:{metric}' for metric in METRICS])
+
+    return {metric: values.get(f'login-metrics:{metric}', 0) for metric in METRICS}
+
+
+def failure_key(email, password):
+    """ Return the cache key of a login attempt, changing with the stored password hash """
+    encoded = get_user_model()._default_manager.filter(
+        **{get_user_model().USERNAME_FIELD: email}
+    ).values_list('password', flat=True).first() or ''
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(),
+        '\0'.join((email, password, encoded)).encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+    return f'login-failure:{digest}'
+
+
+def is_known_failure(key):
+    """ Return whether the attempt already failed, counting it """
+    if get_cache().get(key) is None:
+        return False
+
+    record('known_failures')
+    return True
+
+
+def remember_failure(key):
+    record('failures')
+    get_cache().set(key, True, login_setting('FAILURE_TIMEOUT'))
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """ Sliding window throttle of login attempts, rates from LOGIN_THROTTLE """
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    def get_rate(self):
+        return login_setting('RATES').get(self.scope)
+
+    def allow_request(self, request, view):
+        allowed = super().allow_request(request, view)
+        if not allowed:
+            record(f'throttled_{self.scope}')
+
+        return allowed
+
+
+class LoginIPRateThrottle(LoginRateThrottle):
+    """ Limit the login attempts of a client IP """
+
+    scope = 'login_ip'
+
+    def get_ident(self, request):
+        """ Return the client IP, read from X-Forwarded-For only behind NUM_PROXIES proxies
+
+        Without NUM_PROXIES DRF keys on the whole X-Forwarded-For header, which the
+        client sets freely to get a new limit on every attempt.
+        """
+        if api_settings.NUM_PROXIES:
+            return super().get_ident(request)
+
+        return request.META.get('REMOTE_ADDR')
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginEmailRateThrottle(LoginRateThrottle):
+    """ Limit the login attempts on an email, whatever the client """
+
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email:
+            return None
+
+        ident = hashlib.sha256(email.lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
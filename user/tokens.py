@@ -0,0 +1,28 @@
+""" Issuance of the auth tokens
+
+Logging in returns the token already issued to the user, read with one
+SELECT, so a login costs no write. An expired token is replaced by a new
+key.
+"""
+from django.db import IntegrityError, transaction
+from rest_framework.authtoken.models import Token
+
+from user.authentication import is_expired
+
+
+def issue_token(user):
+    """ Return the token of the user, created or rotated when missing or expired """
+    # Read on every login, the token may have been deleted by another process
+    token = Token.objects.filter(user=user).first()
+    if token is not None and is_expired(token):
+        token.delete()
+        token = None
+    if token is None:
+        try:
+            with transaction.atomic():
+                token = Token.objects.create(user=user)
+        except IntegrityError:
+            # Issued by a concurrent login
+            token = Token.objects.get(user=user)
+
+    return token
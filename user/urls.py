@@ -1,10 +1,12 @@
 from django.urls import path, include
-from user import views
+from user import async_views, views
 
 app_name = 'user'
 
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me')
+    path('token/metrics/', views.LoginMetricsView.as_view(), name='token-metrics'),
+    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('async/me/', async_views.AsyncManageUserView.as_view(), name='async-me'),
 ]
@@ -1,7 +1,12 @@
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
-from rest_framework import generics, authentication, permissions
+from user.throttling import LoginEmailRateThrottle, LoginIPRateThrottle, login_metrics
+from user.tokens import issue_token
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -15,13 +20,31 @@ class CreateTokenView(ObtainAuthToken):
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
+
+    def post(self, request, *args, **kwargs):
+        """ Return the token of the user, without writing when it was already issued """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
+
+        return Response({'token': token.key})
+
+
+class LoginMetricsView(APIView):
+    """ Counters of the rejected login attempts, for the staff """
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(login_metrics())
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """ Handle for the authenticated user """
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):